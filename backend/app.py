@@ -1,18 +1,14 @@
-from typing import List, Dict, Any, Callable
-from functools import partial
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
 import sys
+import argparse
+import time
 import os
-import requests
 import json
-from openai import OpenAI
-from groq import Groq
-import re
-from pathlib import Path
-from datetime import datetime
+from contextlib import contextmanager
+from functools import partial
 
+import asyncio
 import concurrent.futures
-from exa_py import Exa
-from google import genai
 from dotenv import load_dotenv
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -21,30 +17,41 @@ from llm_providers.mappings import (
     GENERATE_FOLLOWUP, 
     GENERATE_RESEARCH_PLAN, 
     GENERATE_QUERIES_FOR_STEP, 
-    GENERATE_REPORT
+    GENERATE_REPORT,
+    STREAM_REPORT,
+    SUMMARIZE_LEARNINGS
 )
+from llm_providers.registry import ProviderRegistry
+from llm_providers.response_cache import LLMResponseCache
+from query_dedup import QueryDeduplicator
+from report_synthesis import condense_learnings, estimate_tokens, get_token_budget
+from checkpoint import RunCheckpoint
+from rate_limit import RateLimiter
+from plan_executor import PlanScheduler, call_maybe_async, execute_plan_async, format_search_result
+from search_transport import SearchTransport, AsyncSearchTransport
+from search_cache import SearchCache
+from search_backends import SEARCH_BACKENDS, SearchRouter
+from speculation import SpeculativePlanner, SpeculativeWork
+from conversation import ConversationState
+from source_store import SOURCE_ID, SourceStore
+from report_store import ReportStore
+from tracing import Tracer
 
 load_dotenv()
 
 # Search Engines
-EXA_API_KEY = os.getenv("EXA_API_KEY")
-EXA_BASE_URL = os.getenv("EXA_BASE_URL")
-exa = Exa(EXA_API_KEY) # This is somehow not used but exceeds the scope of the pr
-
-# LLM clients
-# OpenAI (or openAI compatible inference providers)
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") # If not set OpenAI will be used
-OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
-openai_client = OpenAI(api_key = OPENAI_API_KEY)
-
-# Groq
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
-groq_client = Groq(api_key=GROQ_API_KEY)
+SEARCH_API_KEYS = {
+    "exa": os.getenv("EXA_API_KEY"),
+    "tavily": os.getenv("TAVILY_API_KEY")
+}
+SEARCH_BASE_URLS = {
+    "exa": os.getenv("EXA_BASE_URL") or "https://api.exa.ai/answer",
+    "tavily": os.getenv("TAVILY_BASE_URL") or "https://api.tavily.com/search"
+}
 
-# Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-gemini_client = genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None # Gemini client wont load lazily for some reason
+# LLM clients (OpenAI or openAI compatible inference providers, Groq, Gemini)
+# The SDKs are imported and the clients created on first use, only for the services config.json selects
+provider_registry = ProviderRegistry()
 
 # Configuration and client setup
 
@@ -53,11 +60,47 @@ config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), config_pa
 with open(config_path, 'r') as file:
     config = json.load(file)
 
-clients = {
-    "openai": openai_client,
-    "groq": groq_client,
-    "gemini": gemini_client
+# Pooled HTTP transports shared by every web search
+search_config = config.get("search", {})
+search_transport_options = {
+    "pool_size": search_config.get("pool_size", 20),
+    "connect_timeout": search_config.get("connect_timeout", 5.0),
+    "read_timeout": search_config.get("read_timeout", 60.0)
 }
+search_transport = SearchTransport(**search_transport_options)
+async_search_transport = AsyncSearchTransport(**search_transport_options)
+
+# Search result cache (in-memory LRU in front of a SQLite store), shared across runs
+search_cache = SearchCache.from_config(search_config.get("cache", {}), os.path.dirname(os.path.abspath(__file__)))
+
+# LLM response cache, placed in front of the rate limiter, so hits do not wait for a slot (see bind_operation)
+llm_cache = LLMResponseCache.from_config(config.get("llm_cache", {}), os.path.dirname(os.path.abspath(__file__)))
+
+# Process wide rate limits, adaptive concurrency limits and retries per provider and model,
+# shared by all concurrent jobs
+rate_limiter = RateLimiter.from_config(config)
+
+# Stage level tracing, spans are written to runs/<run_id>/trace.jsonl
+tracer = Tracer.from_config(config.get("tracing", {}), os.path.dirname(os.path.abspath(__file__)))
+
+# Report output directory, filenames are allocated from an index file instead of listing the directory
+report_store = ReportStore.from_config(config["settings"])
+
+# Web search backends, the configured provider first, then the ones used for racing / hedging
+search_backend_names = search_config.get("backends", [search_config.get("provider", "exa")])
+search_router = SearchRouter(
+    [
+        SEARCH_BACKENDS[name](search_transport, async_search_transport, api_key=SEARCH_API_KEYS[name], url=SEARCH_BASE_URLS[name])
+        for name in search_backend_names
+    ],
+    mode = search_config.get("mode", "single"),
+    cache = search_cache,
+    rate_limiter = rate_limiter,
+    hedge_percentile = search_config.get("hedge_percentile", 95),
+    hedge_min_samples = search_config.get("hedge_min_samples", 20),
+    hedge_default_delay = search_config.get("hedge_default_delay", 8.0),
+    max_workers = search_transport.pool_size
+)
 
 def get_service_and_model(operation: str) -> tuple[str, str]:
     """Get the service provider and model for a specific operation."""
@@ -73,7 +116,8 @@ def get_operation_config(operation: str):
         "followup": GENERATE_FOLLOWUP,
         "research_plan": GENERATE_RESEARCH_PLAN,
         "query_generation": GENERATE_QUERIES_FOR_STEP,
-        "report_generation": GENERATE_REPORT
+        "report_generation": GENERATE_REPORT,
+        "learnings_summary": SUMMARIZE_LEARNINGS
     }
     
     service = config["ai_providers"][operation]
@@ -82,125 +126,225 @@ def get_operation_config(operation: str):
     
     return {
         "function": function,
+        "operation": operation,
         "service": service,
-        "model": model,
-        "client": clients[service]
+        "model": model
+    }
+
+def bind_operation(operation_config: Dict[str, Any], function: Callable[..., Any] = None, stream: bool = False) -> Callable[..., Any]:
+    """
+    Bind the model of an operation, the provider client is only created when the operation is first called.
+    Cache hits are answered before the rate limiter, only misses wait for a slot.
+    """
+    function = function or operation_config["function"]
+    service = operation_config["service"]
+    span_attributes = {
+        "operation": operation_config["operation"],
+        "provider": service,
+        "model": operation_config["model"]
     }
 
+    def limited(model: str, **kwargs) -> Any:
+        client = provider_registry.get_client(service)
+        if stream:
+            # The stream is opened and retried inside the limiter, before its first chunk is handed out
+            return rate_limiter.stream(service, model, function, client = client, model = model, **kwargs)
+        return rate_limiter.call(service, model, function, client = client, model = model, **kwargs)
+
+    cache_wrap = llm_cache.wrap_stream if stream else llm_cache.wrap
+    cached = cache_wrap(function, provider_registry.provider_id(service), operation_config["operation"], call = limited)
+
+    def call(**kwargs) -> Any:
+        if stream:
+            # Streams are traced while they are consumed, the request is only sent by then
+            return trace_stream(function.__name__, cached(model = operation_config["model"], **kwargs), span_attributes)
+        with tracer.span(function.__name__, step = kwargs.get("step"), **span_attributes) as span:
+            result = cached(model = operation_config["model"], **kwargs)
+            if span is not None:
+                span.set(
+                    request_bytes = len(json.dumps(kwargs, default=str)),
+                    response_bytes = len(json.dumps(result, default=str))
+                )
+        return result
+
+    return call
+
+def trace_stream(name: str, chunks: Iterator[str], span_attributes: Dict[str, Any]) -> Iterator[str]:
+    """Wrap a stream of chunks in a span covering the whole stream."""
+    with tracer.span(name, **span_attributes) as span:
+        response_bytes = 0
+        for chunk in chunks:
+            response_bytes += len(chunk.encode("utf-8"))
+            yield chunk
+        if span is not None:
+            span.set(response_bytes = response_bytes)
+
 # Get configurations for each operation
 followup_config = get_operation_config("followup")
 research_plan_config = get_operation_config("research_plan")
 query_generation_config = get_operation_config("query_generation")
 report_generation_config = get_operation_config("report_generation")
+learnings_summary_config = get_operation_config("learnings_summary")
 
-# Create partially applied functions with client and model already bound
-generate_followup = partial(
-    followup_config["function"], 
-    client=followup_config["client"], 
-    model=followup_config["model"]
-)
-
-generate_research_plan = partial(
-    research_plan_config["function"], 
-    client=research_plan_config["client"], 
-    model=research_plan_config["model"]
-)
+# Create the operation functions with client and model already bound
+generate_followup = bind_operation(followup_config)
+generate_research_plan = bind_operation(research_plan_config)
+generate_queries_for_step = bind_operation(query_generation_config)
+generate_report = bind_operation(report_generation_config)
+summarize_learnings = bind_operation(learnings_summary_config)
 
-generate_queries_for_step = partial(
-    query_generation_config["function"], 
-    client=query_generation_config["client"], 
-    model=query_generation_config["model"]
-)
-
-generate_report = partial(
-    report_generation_config["function"], 
-    client=report_generation_config["client"], 
-    model=report_generation_config["model"]
-)
+# Streaming variant of the report generation, routed to the same service and model
+stream_report = bind_operation(report_generation_config, STREAM_REPORT[report_generation_config["service"]], stream = True)
 
 # Functions
 
-def run_followup_loop(initial_query: str, iterations: int = 3) -> Dict[str, Any]:
-    """Iteratively generate follow-up questions and collect user responses."""
-    context = initial_query
-    history = []
+def run_followup_loop(initial_query: str, iterations: int = 3, answer_fn: Callable[[str], str] = None,
+                      planner: Optional[SpeculativePlanner] = None) -> Dict[str, Any]:
+    """
+    Iteratively generate follow-up questions and collect user responses.
+
+    With a planner, research planning runs in the background while the user is answering.
+    """
+    with tracer.span("run_followup_loop", iterations = iterations) as span:
+        result = _run_followup_loop(initial_query, iterations, answer_fn, planner)
+        if span is not None and planner is not None:
+            span.set(**{f"speculations_{name}": count for name, count in planner.stats().items()})
+        return result
+
+def _run_followup_loop(initial_query: str, iterations: int, answer_fn: Optional[Callable[[str], str]],
+                       planner: Optional[SpeculativePlanner]) -> Dict[str, Any]:
+    conversation = ConversationState(initial_query)
+    max_context_tokens = config["settings"].get("followup_context_tokens", 2000)
     for i in range(iterations):
+        context = conversation.render(max_context_tokens)
+        if planner is not None:
+            planner.before_followup(context)
         followup = generate_followup(context = context)
         question = followup.get("question", "Could you elaborate?")
-        print(f"\nAssistant: {question}")
-        user_answer = input("Your response: ")
-        context += f" Follow-up Q: {question} Follow-up A: {user_answer}"
-        history.append({
-            "iteration": i + 1,
-            "question": question,
-            "answer": user_answer,
-            "context_snapshot": context
-        })
+        if answer_fn is None:
+            print(f"\nAssistant: {question}")
+            user_answer = input("Your response: ")
+        else:
+            user_answer = answer_fn(question)
+        if planner is not None:
+            planner.after_answer(question, user_answer)
+        conversation.add_turn(question, user_answer)
         # Write each interaction to the output file
-        # write_output_to_file(f"### Follow-up Interaction {i + 1}\n**Question:** {question}\n**Answer:** {user_answer}\n**Context Snapshot:** {context}")
+        # write_output_to_file(f"### Follow-up Interaction {i + 1}\n**Question:** {question}\n**Answer:** {user_answer}")
     return {
-        "final_context": context,
-        "interaction_history": history,
+        "final_context": conversation.render(max_context_tokens),
+        "interaction_history": conversation.turns,
         "initial_query": initial_query,
         "total_iterations": iterations
     }
 
-def execute_plan(plan_steps: Dict[str, str]) -> Dict:
-    """ Execute each step of the research plan and fetch search results. """
-    search_queries_and_responses = {"plan": {}}
+def new_source_store(checkpoint: Optional[RunCheckpoint] = None) -> SourceStore:
+    """Source store with the configured limits, recording new sources to the checkpoint if given."""
+    return SourceStore(
+        max_sources = config["settings"].get("max_sources", 500),
+        max_text_chars = config["settings"].get("source_text_chars", 1000),
+        on_add = checkpoint.record_source if checkpoint is not None else None
+    )
 
-    for step, description in plan_steps.items():
-        # Generate search queries for the step
-        search_queries = generate_queries_for_step(step = step, description = description)
-        
-        if step in search_queries:
-            queries = search_queries[step].get("search_queries", [])
-        else:
-            queries = ["No queries generated"]
-        
-        # Execute the queries and fetch search results
-        search_results = execute_queries(queries)
-
-        print({
-            "plan_step": description,
-            "search_queries": queries,
-            "search_results": search_results  # Includes answers and citations
-        })
-
-        # Store results
-        search_queries_and_responses["plan"][step] = {
-            "plan_step": description,
-            "search_queries": queries,
-            "search_results": search_results  # Includes answers and citations
-        }
+def speculative_research(initial_query: str, with_searches: bool = False, web_search: Callable[[str], Any] = None) -> SpeculativeWork:
+    """
+    Background work of the speculative planner, the research plan of a context snapshot and optionally its searches.
+
+    The searches intern their citations in a store of their own, so a cancelled speculation
+    leaves nothing behind in the run's sources or checkpoint (see adopt_speculative_plan).
+    """
+    def work(context: str, cancelled) -> Dict[str, Any]:
+        with tracer.span("speculative_research", searches = with_searches):
+            research_plan = generate_research_plan(initial_query = initial_query, followup_context = context)
+            if not with_searches or cancelled.is_set():
+                return {"research_plan": research_plan}
+
+            async def search(query: str) -> Dict:
+                # Searches not started yet are skipped once the speculation is cancelled
+                if cancelled.is_set():
+                    return {"error": "speculation cancelled"}
+                return await call_maybe_async(web_search or async_web_search_wrapper, query)
 
-        # Write the search results to the output file
-        # write_output_to_file(f"### Search Results for {step}\n" + json.dumps({
-        #     "plan_step": description,
-        #     "search_queries": queries,
-        #     "search_results": search_results
-        # }, indent=2))
+            sources = new_source_store()
+            plan_result = execute_plan(research_plan["plan"], search = search, verbose = False, sources = sources)
+            return {"research_plan": research_plan, "plan_result": plan_result, "sources": sources}
+
+    return work
+
+def adopt_speculative_plan(speculation: Dict[str, Any], checkpoint: RunCheckpoint, sources: SourceStore) -> Dict:
+    """
+    Take over the plan result of a kept speculation: its sources are interned in the run's
+    store (and so checkpointed) under the run's ids, and its steps are checkpointed.
+    """
+    new_ids = sources.merge(speculation["sources"])
+    plan = {}
+    for step, step_result in speculation["plan_result"]["plan"].items():
+        queries = {
+            query: {**result, "sources": [new_ids[source_id] for source_id in result["sources"] if source_id in new_ids]}
+            if "sources" in result else result
+            for query, result in step_result["search_results"]["queries"].items()
+        }
+        plan[step] = {**step_result, "search_results": {**step_result["search_results"], "queries": queries}}
+        checkpoint.record_step(step, plan[step])
+    return {**speculation["plan_result"], "plan": plan}
 
-    return search_queries_and_responses
+def execute_plan(plan_steps: Dict[str, str], checkpoint: Optional[RunCheckpoint] = None,
+                 search: Callable[[str], Any] = None, verbose: bool = True, sources: Optional[SourceStore] = None,
+                 scheduler: Optional[PlanScheduler] = None) -> Dict:
+    """
+    Execute the steps of the research plan concurrently and fetch search results, interning citations in sources.
 
-def execute_queries(step_queries: Dict[str, List[str]]) -> Dict:
+    With a scheduler the plan runs on its shared event loop, next to the plans of the other jobs.
+    """
+    def print_step(step: str, step_result: Dict):
+        if verbose:
+            print(step_result)
+        if checkpoint is not None:
+            checkpoint.record_step(step, step_result)
+
+    plan_kwargs = dict(
+        plan_steps = plan_steps,
+        generate_queries = generate_queries_for_step,
+        search = search or async_web_search_wrapper,
+        on_step_complete = print_step,
+        deduplicator = QueryDeduplicator(config["settings"].get("query_dedup_threshold", 1.0)),
+        completed_steps = checkpoint.completed_steps() if checkpoint is not None else None,
+        completed_searches = checkpoint.completed_searches() if checkpoint is not None else None,
+        on_search_complete = checkpoint.record_search if checkpoint is not None else None,
+        format_result = partial(format_search_result, sources = sources, max_citations = config["settings"].get("max_citations_per_query", 3))
+    )
+    if scheduler is not None:
+        return scheduler.run(**plan_kwargs)
+
+    async def run() -> Dict:
+        # Same pool size as the service's PlanScheduler, asyncio.run would size it from the CPU count
+        asyncio.get_running_loop().set_default_executor(concurrent.futures.ThreadPoolExecutor(
+            max_workers = config["settings"].get("plan_worker_threads") or
+                          config["settings"].get("max_concurrent_searches", 8) + config["settings"].get("max_concurrent_llm_calls", 5)
+        ))
+        try:
+            return await execute_plan_async(
+                max_concurrent_searches = config["settings"].get("max_concurrent_searches", 8),
+                max_concurrent_llm_calls = config["settings"].get("max_concurrent_llm_calls", 5),
+                **plan_kwargs
+            )
+        finally:
+            await async_search_transport.aclose()
+
+    return asyncio.run(run())
+
+def execute_queries(step_queries: Dict[str, List[str]], sources: Optional[SourceStore] = None) -> Dict:
     """Execute search queries in parallel and return the top 3 citations from each result."""
     search_results = {"queries": {}}
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=search_transport.pool_size) as executor:
         future_to_query = {executor.submit(web_search_wrapper, query): query for query in step_queries}
 
         for future in concurrent.futures.as_completed(future_to_query):
             query = future_to_query[future]
             try:
                 response = future.result()
-                answer = response.get("answer", "No answer found")
-                citations = response.get("citations", [])[:1]  # Get top 3 citations
-
-                search_results["queries"][query] = {
-                    "answer": answer,
-                    "top_citations": citations
-                }
+                search_results["queries"][query] = format_search_result(response, sources, config["settings"].get("max_citations_per_query", 3))
             except Exception as exc:
                 search_results["queries"][query] = {
                     "error": str(exc)
@@ -208,113 +352,261 @@ def execute_queries(step_queries: Dict[str, List[str]]) -> Dict:
 
     return search_results
 
-# wrapper for web search -- roadmap -> add multiple supports (exa, firecrawl, tavily search)
-def web_search_wrapper(query:str)->Dict:
-    """a wrapper around exa answer api"""
-    data = {"query": query , "text" : True}
-    try:
-        response = requests.post(EXA_BASE_URL, json=data , headers={"Authorization" :  f"Bearer {EXA_API_KEY}", "Content-type" : "application/json"})
-        response.raise_for_status
-        return response.json()
-    except requests.exceptions.RequestException as error:
-        return {"error" : str(error)}
+# wrapper for web search, the backends (exa, tavily) and race / hedge modes are set in config.json
+def web_search_wrapper(query:str, bypass_cache: bool = False)->Dict:
+    """a wrapper around the configured search backends"""
+    with tracer.span("web_search", query = query, provider = "+".join(search_backend_names)) as span:
+        response = search_router.search(query, bypass_cache=bypass_cache)
+        trace_search_response(span, response)
+    return response
+
+async def async_web_search_wrapper(query:str, bypass_cache: bool = False)->Dict:
+    """async variant of web_search_wrapper, used by the plan executor"""
+    with tracer.span("web_search", query = query, provider = "+".join(search_backend_names)) as span:
+        response = await search_router.asearch(query, bypass_cache=bypass_cache)
+        trace_search_response(span, response)
+    return response
+
+def trace_search_response(span, response: Dict):
+    if span is not None:
+        span.set(response_bytes = len(json.dumps(response, default=str)), error = response.get("error"))
 
 # extract learning from the search results
-def extract_learnings(output: dict) -> str:
-    """Extract learnings from the search results."""
-    learnings = []
+def extract_step_learnings(output: dict) -> Dict[str, List[str]]:
+    """Extract learnings from the search results, grouped by plan step."""
+    step_learnings = {}
+    seen_queries = set()
     for step, data in output["plan"].items():
         plan_step = data["plan_step"]
         search_results = data["search_results"]["queries"]
+        learnings = step_learnings.setdefault(plan_step, [])
         for query, result in search_results.items():
+            if "error" in result:
+                continue
+            # Results shared by duplicate queries are only included once
+            searched_query = result.get("canonical_query", query)
+            if searched_query in seen_queries:
+                continue
+            seen_queries.add(searched_query)
             answer = result["answer"]
-            citations = result["top_citations"]
-            learnings.append(f"### {plan_step}\n**Query:** {query}\n**Answer:** {answer}\n**Citations:** {json.dumps(citations, indent=2)}")
-    return "\n\n".join(learnings)
+            if "sources" in result:
+                # Ids of the run's source store, the source texts are listed once after the learnings
+                source_ids = " ".join(f"[{source_id}]" for source_id in result["sources"])
+                learnings.append(f"### {plan_step}\n**Query:** {query}\n**Answer:** {answer}\n**Sources:** {source_ids}")
+            else:
+                citations = result["top_citations"]
+                learnings.append(f"### {plan_step}\n**Query:** {query}\n**Answer:** {answer}\n**Citations:** {json.dumps(citations, indent=2)}")
+    return step_learnings
 
-def generate_unique_filename(base_format: str, save_path: str) -> str:
-    """
-    Generate a unique filename based on the format specified in config.
-    Supports patterns like:
-    - {date} : current date
-    - {time} : current time
-    - {n} : incremental number for collision avoidance
-    
-    Example formats:
-    - "report_{date}_{n}.md"
-    - "final_report_{n}.md"
-    - "{date}_research_{time}.md"
-    """
-    
-    # Create the save directory if it doesn't exist
-    save_path = Path(save_path)
-    save_path.mkdir(parents=True, exist_ok=True)
-    
-    # Replace date and time patterns
-    now = datetime.now()
-    filename = base_format.replace('{date}', now.strftime('%Y%m%d'))
-    filename = filename.replace('{time}', now.strftime('%H%M%S'))
-    
-    # Handle incremental numbering if {n} is in the format
-    if '{n}' in filename:
-        pattern = filename.replace('{n}', r'(\d*)')
-        pattern = '^' + pattern.replace('.', r'\.') + '$'
-        
-        # Get existing files that match the pattern
-        existing_files = []
-        for f in save_path.glob('*'):
-            if re.match(pattern, f.name):
-                match = re.search(pattern, f.name)
-                num = int(match.group(1)) if match.group(1) else 0
-                existing_files.append(num)
-                
-        # Find the next available number
-        next_num = 1
-        if existing_files:
-            next_num = max(existing_files) + 1
-            
-        filename = filename.replace('{n}', str(next_num))
-    else:
-        # If no {n} pattern but file exists, append number
-        base_path = save_path / filename
-        if base_path.exists():
-            name_parts = filename.rsplit('.', 1)
-            counter = 1
-            while (save_path / filename).exists():
-                filename = f"{name_parts[0]}{counter}.{name_parts[1]}"
-                counter += 1
-
-    return str(save_path / filename)
+def extract_learnings(output: dict) -> str:
+    """Extract learnings from the search results."""
+    return "\n\n".join(
+        learning for learnings in extract_step_learnings(output).values() for learning in learnings
+    )
+
+def filter_relevant_results(output: dict, sources: Optional[SourceStore] = None) -> dict:
+    """Trim the search results of every plan step to their most relevant, non-duplicate sentences."""
+    # Imported here, numpy is only loaded once a run gets this far
+    from relevance import filter_search_results
+
+    with tracer.span("relevance_filter") as span:
+        filtered = filter_search_results(
+            output,
+            sources,
+            step_byte_budget = config["settings"].get("step_byte_budget", 8000),
+            dedup_threshold = config["settings"].get("passage_dedup_threshold", 0.8)
+        )
+        if span is not None:
+            span.set(request_bytes = len(json.dumps(output, default=str)), response_bytes = len(json.dumps(filtered, default=str)))
+    return filtered
+
+def synthesize_learnings(output: dict, sources: Optional[SourceStore] = None) -> str:
+    """Extract learnings and condense them with map-reduce summarization when they exceed the report model's budget."""
+    with tracer.span("extract_learnings") as span:
+        learnings = _synthesize_learnings(output, sources)
+        if span is not None:
+            span.set(response_bytes = len(learnings.encode("utf-8")))
+    return learnings
+
+def _synthesize_learnings(output: dict, sources: Optional[SourceStore]) -> str:
+    token_budgets = config.get("token_budgets", {})
+    report_budget = get_token_budget(token_budgets, report_generation_config["model"])
+    summary_budget = get_token_budget(token_budgets, learnings_summary_config["model"])
+    step_learnings = extract_step_learnings(output)
+
+    # Every cited source once, taking a share of the report budget
+    sources_block = ""
+    if sources is not None:
+        cited = SOURCE_ID.findall("\n".join(learning for learnings in step_learnings.values() for learning in learnings))
+        sources_block = sources.format_sources(
+            cited, int(report_budget["max_input_tokens"] * config["settings"].get("sources_token_share", 0.3))
+        )
+
+    learnings = condense_learnings(
+        step_learnings,
+        summarize = summarize_learnings,
+        max_input_tokens = max(0, report_budget["max_input_tokens"] - estimate_tokens(sources_block)),
+        chunk_tokens = min(summary_budget["chunk_tokens"], summary_budget["max_input_tokens"]),
+        max_workers = config["settings"].get("max_concurrent_llm_calls", 5)
+    )
+    return f"{learnings}\n\n## Sources\n\n{sources_block}" if sources_block else learnings
 
 # save the report to a markdown file
-def save_report_to_file(report: str):
+def save_report_to_file(report: str, filename: Optional[str] = None):
     """Save the generated report to a markdown file."""
-    save_path = config['settings'].get('report_save_path', 'reports')
-    name_format = config['settings'].get('report_name_format', 'final_report_{n}.md')
-    
-    filename = generate_unique_filename(name_format, save_path)
-    
-    with open(filename, "w") as file:
-        file.write(report)
+    return report_store.write(report, filename)
+
+def save_report_stream(chunks: Iterable[str], echo: bool = True, filename: Optional[str] = None) -> str:
+    """Write report chunks to a .partial file as they arrive, so a partial report survives errors."""
+    return report_store.write_stream(chunks, echo = echo, filename = filename)
+
+def notify_chunks(chunks: Iterable[str], callback: Callable[[str], None]) -> Iterator[str]:
+    """Pass the chunks through, handing each one to callback as well."""
+    for chunk in chunks:
+        callback(chunk)
+        yield chunk
+
+@contextmanager
+def timed(timings: Optional[Dict[str, float]], stage: str):
+    """Record the wall time of a pipeline stage into timings, if given."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = round(time.perf_counter() - start, 3)
+
+def run_research(checkpoint: RunCheckpoint, **kwargs) -> str:
+    """Run the research pipeline (see _run_research), tracing every stage under the run id."""
+    with tracer.trace(checkpoint.run_id), tracer.span("run_research", run_id = checkpoint.run_id):
+        return _run_research(checkpoint, **kwargs)
+
+def _run_research(
+    checkpoint: RunCheckpoint,
+    initial_query: Optional[str] = None,
+    followup_answers: Optional[List[str]] = None,
+    skip_followups: bool = False,
+    report_filename: Optional[str] = None,
+    search: Callable[[str], Any] = None,
+    verbose: bool = True,
+    timings: Optional[Dict[str, float]] = None,
+    scheduler: Optional[PlanScheduler] = None,
+    on_report_chunk: Optional[Callable[[str], None]] = None,
+    refresh_searches: bool = False
+) -> str:
+    """
+    Run the full research pipeline, skipping every stage already completed in the checkpoint.
+
+    Interactive by default. Headless callers pass the query and either the follow-up answers
+    (one per follow-up iteration) or skip_followups. on_report_chunk gets the report text as it
+    is written, e.g. to stream it to a client of the research service. refresh_searches skips the
+    search cache lookups, the fresh results still replace the cached ones.
+    """
+    if refresh_searches and search is None:
+        search = partial(async_web_search_wrapper, bypass_cache = True)
+
+    if checkpoint.load_stage("query") is None:
+        if initial_query is None:
+            initial_query = input("Enter your query:")
+        checkpoint.save_stage("query", initial_query)
+    initial_query = checkpoint.load_stage("query")
+
+    # Citations of the run, restored from the checkpoint so that the ids of a resumed run stay the same
+    sources = new_source_store(checkpoint)
+    sources.load(checkpoint.sources())
+
+    planner = None
+    followup_result = checkpoint.load_stage("followup")
+    if followup_result is None:
+        with timed(timings, "followup"):
+            if skip_followups:
+                followup_result = run_followup_loop(initial_query, iterations=0)
+            elif followup_answers is not None:
+                answers = iter(followup_answers)
+                followup_result = run_followup_loop(initial_query, iterations=len(followup_answers), answer_fn=lambda question: next(answers))
+            else:
+                if config["settings"].get("speculative_planning", False):
+                    planner = SpeculativePlanner(
+                        speculative_research(initial_query, config["settings"].get("speculative_searches", False), search),
+                        max_new_terms = config["settings"].get("speculation_max_new_terms", 0)
+                    )
+                followup_result = run_followup_loop(initial_query, iterations=config["settings"]["followup_iterations"], planner=planner)
+        checkpoint.save_stage("followup", followup_result)
+
+    # Planning done while the user answered the follow-ups, kept when the answers did not change the context
+    speculation = planner.result() if planner is not None else None
+
+    research_plan = checkpoint.load_stage("research_plan")
+    if research_plan is None:
+        with timed(timings, "research_plan"):
+            if speculation is not None:
+                research_plan = speculation["research_plan"]
+            else:
+                research_plan = generate_research_plan(initial_query = followup_result["initial_query"], followup_context = followup_result["final_context"])
+        checkpoint.save_stage("research_plan", research_plan)
+
+    learnings_string = checkpoint.load_stage("learnings")
+    if learnings_string is None:
+        plan_steps = research_plan["plan"]
+        with timed(timings, "execute_plan"):
+            if speculation is not None and speculation.get("plan_result") is not None:
+                result = adopt_speculative_plan(speculation, checkpoint, sources)
+            else:
+                result = execute_plan(plan_steps, checkpoint, search = search, verbose = verbose, sources = sources, scheduler = scheduler)
+
+        # Extract learnings from the result, condensed to fit the report model's token budget
+        with timed(timings, "learnings"):
+            if config["settings"].get("relevance_filter", True):
+                result = filter_relevant_results(result, sources)
+            learnings_string = synthesize_learnings(result, sources)
+        checkpoint.save_stage("learnings", learnings_string)
+
+    filename = checkpoint.load_stage("report")
+    if filename is None:
+        with timed(timings, "report"):
+            if config["settings"].get("stream_report", False):
+                # Stream the report straight into the output file
+                chunks = sources.expand_stream(stream_report(prompt = initial_query, learnings = learnings_string))
+                if on_report_chunk is not None:
+                    chunks = notify_chunks(chunks, on_report_chunk)
+                filename = save_report_stream(
+                    chunks,
+                    echo = verbose,
+                    filename = report_filename
+                )
+            else:
+                # report generation call
+                report = generate_report(prompt = initial_query, learnings = learnings_string)
+                # Turn the source ids into links
+                report = sources.expand(report)
+                if on_report_chunk is not None:
+                    on_report_chunk(report)
+
+                # Save the report
+                filename = save_report_to_file(report, filename = report_filename)
+        checkpoint.save_stage("report", filename)
     return filename
 
 # Main 
 if __name__ == "__main__":
-    # Clear the output file at the start of the script
-    # open("output.md", "w").close()
-
-    initial_query = input("Enter your query:")
-    followup_result = run_followup_loop(initial_query, iterations=config["settings"]["followup_iterations"])
-    research_plan = generate_research_plan(initial_query = followup_result["initial_query"], followup_context = followup_result["final_context"])
-    plan_steps = research_plan["plan"]
-    result = execute_plan(plan_steps)
-
-    # Extract learnings from the result
-    learnings_string = extract_learnings(result)
-
-    # report generation call
-    report = generate_report(prompt = initial_query, learnings = learnings_string)
-
-    # Save the report
-    save_report_to_file(report)
-    print("Report generated and saved to final_report.md")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Deeper Seeker research assistant")
+    parser.add_argument("--resume", metavar="RUN_ID", help="resume an interrupted run from its checkpoint")
+    parser.add_argument("--refresh-searches", action="store_true", help="search again instead of reusing cached search results")
+    args = parser.parse_args()
+
+    runs_path = config["settings"].get("runs_path", "runs")
+    runs_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), runs_path)
+    if args.resume:
+        checkpoint = RunCheckpoint.resume(runs_path, args.resume)
+        print(f"Resuming run {checkpoint.run_id}")
+    else:
+        checkpoint = RunCheckpoint.create(runs_path)
+        print(f"Run id: {checkpoint.run_id} (resume with --resume {checkpoint.run_id})")
+
+    filename = run_research(checkpoint, refresh_searches = args.refresh_searches)
+    print(f"Report generated and saved to {filename}")
+    print(f"\nTime spent per stage:\n{tracer.format_summary(checkpoint.run_id)}\n")
+    print(f"Search cache stats: {search_cache.stats()}")
+    print(f"LLM cache stats: {llm_cache.stats()}")
+    print(f"Rate limiter stats: {rate_limiter.stats()}")
+    print(f"Search backend stats: {search_router.stats()}")
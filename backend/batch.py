@@ -0,0 +1,131 @@
+"""
+Headless batch runner for research jobs.
+
+Reads jobs from a JSONL file, one job per line:
+
+    {"id": "ev-market", "query": "Overview of the EV market in 2024", "followup_answers": ["Europe only"]}
+    {"id": "cloud", "query": "Competitive landscape of cloud computing", "skip_followups": true}
+
+A job with "refresh_searches": true searches again instead of reusing the cached search results.
+
+Jobs run concurrently in one process, so they share the connection pools, the search and LLM
+caches and the per-provider concurrency limits. Each job writes <id>.md to the output directory
+and a manifest.json summarizes the status and stage timings of every job. Every job is also
+checkpointed, so running the same batch again resumes the unfinished jobs.
+
+Usage: python batch.py jobs.jsonl --output batch_output --max-jobs 8
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import re
+import time
+import traceback
+from functools import partial
+from typing import Any, Dict, List
+
+import app
+from cache import make_cache_key
+from checkpoint import RunCheckpoint
+
+def load_jobs(path: str) -> List[Dict[str, Any]]:
+    """Read the jobs file, giving every job a filesystem safe id."""
+    jobs = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            if "query" not in job:
+                raise ValueError(f"Job on line {line_number} has no query")
+            job_id = str(job.get("id", f"job_{line_number}"))
+            job["id"] = re.sub(r"[^A-Za-z0-9_.-]", "_", job_id)
+            if any(existing["id"] == job["id"] for existing in jobs):
+                raise ValueError(f"Duplicate job id {job['id']} on line {line_number}")
+            jobs.append(job)
+    return jobs
+
+def job_run_id(job: Dict[str, Any], report_filename: str) -> str:
+    """
+    Run id of a job, keyed on what the job asks for as well as its id. Running the same job
+    again resumes its checkpoint, a different job that happens to get the same id (e.g. the
+    default job_<line>) starts a run of its own.
+    """
+    content = make_cache_key(
+        job["query"], job.get("followup_answers"), job.get("skip_followups"), os.path.abspath(report_filename)
+    )
+    return f"batch_{job['id']}_{content[:12]}"
+
+def run_job(job: Dict[str, Any], output_dir: str, runs_path: str) -> Dict[str, Any]:
+    """Run a single job and return its manifest entry. Failures are recorded, not raised.
+
+    Jobs without followup_answers skip the follow-up questions, there is nobody to answer them.
+    """
+    timings: Dict[str, float] = {}
+    report_filename = os.path.join(output_dir, f"{job['id']}.md")
+    entry = {"id": job["id"], "query": job["query"], "run_id": job_run_id(job, report_filename)}
+    start = time.perf_counter()
+    try:
+        checkpoint = RunCheckpoint(os.path.join(runs_path, entry["run_id"]))
+        entry["report"] = app.run_research(
+            checkpoint,
+            initial_query = job["query"],
+            followup_answers = job.get("followup_answers"),
+            skip_followups = job.get("skip_followups", "followup_answers" not in job),
+            report_filename = report_filename,
+            # The blocking search wrapper shares one connection pool across all jobs
+            search = partial(app.web_search_wrapper, bypass_cache = True) if job.get("refresh_searches") else app.web_search_wrapper,
+            verbose = False,
+            timings = timings
+        )
+        entry["status"] = "completed"
+    except Exception as exc:
+        entry["status"] = "failed"
+        entry["error"] = f"{type(exc).__name__}: {exc}"
+        entry["traceback"] = traceback.format_exc()
+    entry["timings"] = timings
+    entry["trace_summary"] = app.tracer.summary(entry["run_id"])
+    app.tracer.discard(entry["run_id"])
+    entry["total_seconds"] = round(time.perf_counter() - start, 3)
+    return entry
+
+def run_batch(jobs: List[Dict[str, Any]], output_dir: str, max_jobs: int) -> Dict[str, Any]:
+    os.makedirs(output_dir, exist_ok=True)
+    runs_path = os.path.join(os.path.dirname(os.path.abspath(app.__file__)), app.config["settings"].get("runs_path", "runs"))
+
+    start = time.perf_counter()
+    entries = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_jobs) as executor:
+        future_to_job = {executor.submit(run_job, job, output_dir, runs_path): job for job in jobs}
+        for future in concurrent.futures.as_completed(future_to_job):
+            entry = future.result()
+            entries[entry["id"]] = entry
+            print(f"[{entry['status']}] {entry['id']} in {entry['total_seconds']}s")
+
+    manifest = {
+        "total_jobs": len(jobs),
+        "completed": sum(entry["status"] == "completed" for entry in entries.values()),
+        "failed": sum(entry["status"] == "failed" for entry in entries.values()),
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "search_cache": app.search_cache.stats(),
+        "llm_cache": app.llm_cache.stats(),
+        "rate_limits": app.rate_limiter.stats(),
+        # Keep the order of the jobs file
+        "jobs": [entries[job["id"]] for job in jobs]
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, ensure_ascii=False)
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("jobs", help="JSONL file with one research job per line")
+    parser.add_argument("--output", default="batch_output", help="directory for the reports and manifest.json")
+    parser.add_argument("--max-jobs", type=int, default=app.config["settings"].get("max_concurrent_jobs", 8),
+                        help="number of jobs to run at the same time")
+    args = parser.parse_args()
+
+    manifest = run_batch(load_jobs(args.jobs), args.output, args.max_jobs)
+    print(f"{manifest['completed']}/{manifest['total_jobs']} jobs completed in {manifest['wall_seconds']}s, "
+          f"manifest written to {os.path.join(args.output, 'manifest.json')}")
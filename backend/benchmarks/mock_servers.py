@@ -0,0 +1,215 @@
+"""
+Local stand-ins for the OpenAI compatible chat completions endpoint and the Exa answer endpoint.
+
+The servers answer with canned payloads shaped like the real APIs after a latency drawn from a
+configurable distribution, so the pipeline can be benchmarked without API keys or network noise.
+
+Run standalone with: python benchmarks/mock_servers.py --port 8765
+then point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1 and
+EXA_BASE_URL=http://127.0.0.1:8765/answer
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompts import FOLLOWUP_PROMPT, RESEARCH_PLAN_PROMPT, GEN_QUERY_PROMPT
+
+class LatencyDistribution:
+    """
+    Latency in seconds drawn from one of:
+    - {"kind": "fixed", "seconds": 0.2}
+    - {"kind": "uniform", "low": 0.1, "high": 0.5}
+    - {"kind": "lognormal", "median": 0.3, "sigma": 0.5}  (long tail, closest to real APIs)
+    """
+
+    def __init__(self, kind: str = "fixed", **parameters):
+        self.kind = kind
+        self.parameters = parameters
+
+    @classmethod
+    def parse(cls, value: Optional[Dict[str, Any]]) -> "LatencyDistribution":
+        return cls(**(value or {"kind": "fixed", "seconds": 0.0}))
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.parameters.get("seconds", 0.0)
+        if self.kind == "uniform":
+            return random.uniform(self.parameters.get("low", 0.0), self.parameters.get("high", 0.0))
+        if self.kind == "lognormal":
+            return random.lognormvariate(0, self.parameters.get("sigma", 0.5)) * self.parameters.get("median", 0.1)
+        raise ValueError(f"Unknown latency distribution {self.kind}")
+
+class MockState:
+    """Settings shared by the request handlers, can be changed between benchmark scenarios."""
+
+    def __init__(self, llm_latency: LatencyDistribution, search_latency: LatencyDistribution,
+                 plan_width: int = 5, answer_chars: int = 1500):
+        self.llm_latency = llm_latency
+        self.search_latency = search_latency
+        self.plan_width = plan_width
+        self.answer_chars = answer_chars
+        self.counts = {"chat": 0, "search": 0}
+        self._lock = threading.Lock()
+
+    def count(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+def canned_completion(state: MockState, system_prompt: str, user_content: str) -> str:
+    """Pick a payload shaped like what the real model returns for each prompt of the pipeline."""
+    if system_prompt == FOLLOWUP_PROMPT:
+        return json.dumps({"question": "Which region and time frame should the research focus on?", "query_context": user_content})
+    if system_prompt == RESEARCH_PLAN_PROMPT:
+        return json.dumps({"plan": {f"step {i}": f"Research aspect {i} of: {user_content[:80]}" for i in range(1, state.plan_width + 1)}})
+    if system_prompt == GEN_QUERY_PROMPT:
+        return json.dumps({
+            "plan_step": user_content,
+            "search_queries": [f"{user_content} market size", f"{user_content} key players", f"{user_content} recent news"]
+        })
+    # Report generation and learnings summaries, plain markdown
+    return "# Mock report\n\n" + "\n\n".join(
+        f"## Section {i}\n\n" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20 for i in range(1, 6)
+    )
+
+def make_handler(state: MockState):
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _read_json(self) -> Dict[str, Any]:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _send_json(self, payload: Dict[str, Any], status: int = 200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path.rstrip("/").endswith("/chat/completions"):
+                self._chat_completions(self._read_json())
+            elif self.path.rstrip("/").endswith("/answer"):
+                self._answer(self._read_json())
+            else:
+                self._send_json({"error": f"unknown path {self.path}"}, status=404)
+
+        def _chat_completions(self, request: Dict[str, Any]):
+            state.count("chat")
+            time.sleep(state.llm_latency.sample())
+            messages = request.get("messages", [])
+            system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+            user_content = next((m["content"] for m in messages if m["role"] == "user"), "")
+            content = canned_completion(state, system_prompt, user_content)
+            usage = {"prompt_tokens": sum(len(m["content"]) for m in messages) // 4, "completion_tokens": len(content) // 4}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+            if not request.get("stream"):
+                self._send_json({
+                    "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": request.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": usage
+                })
+                return
+
+            # Server sent events, one chunk per ~200 characters
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(content), 200):
+                self._send_event({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": request.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": content[start:start + 200]}, "finish_reason": None}]
+                })
+            if (request.get("stream_options") or {}).get("include_usage"):
+                self._send_event({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": request.get("model"),
+                    "choices": [], "usage": usage
+                })
+            self._send_chunk(b"data: [DONE]\n\n")
+            self._send_chunk(b"")
+
+        def _send_event(self, payload: Dict[str, Any]):
+            self._send_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+        def _send_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _answer(self, request: Dict[str, Any]):
+            state.count("search")
+            time.sleep(state.search_latency.sample())
+            query = request.get("query", "")
+            text = (f"Findings about {query}. " * 200)[:state.answer_chars]
+            self._send_json({
+                "answer": f"Mock answer for '{query}'. " + text[:300],
+                "citations": [
+                    {"id": f"https://example.com/{i}/{uuid.uuid5(uuid.NAMESPACE_URL, query).hex[:8]}",
+                     "url": f"https://example.com/{i}/{uuid.uuid5(uuid.NAMESPACE_URL, query).hex[:8]}",
+                     "title": f"Source {i} for {query}", "text": text}
+                    for i in range(3)
+                ]
+            })
+
+    return MockHandler
+
+class MockServers:
+    """Runs the mock endpoints on a local port in a background thread, use as a context manager."""
+
+    def __init__(self, state: MockState, host: str = "127.0.0.1", port: int = 0):
+        self.state = state
+        self.server = ThreadingHTTPServer((host, port), make_handler(state))
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_base_url(self) -> str:
+        return f"{self.base_url}/v1"
+
+    @property
+    def exa_base_url(self) -> str:
+        return f"{self.base_url}/answer"
+
+    def __enter__(self) -> "MockServers":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-latency", type=json.loads, default={"kind": "lognormal", "median": 0.8, "sigma": 0.4})
+    parser.add_argument("--search-latency", type=json.loads, default={"kind": "lognormal", "median": 0.5, "sigma": 0.6})
+    parser.add_argument("--plan-width", type=int, default=5)
+    args = parser.parse_args()
+
+    state = MockState(LatencyDistribution.parse(args.llm_latency), LatencyDistribution.parse(args.search_latency), args.plan_width)
+    with MockServers(state, port=args.port) as servers:
+        print(f"OPENAI_BASE_URL={servers.openai_base_url}\nEXA_BASE_URL={servers.exa_base_url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
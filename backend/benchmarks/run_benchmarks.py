@@ -0,0 +1,198 @@
+"""
+Offline benchmark suite for the research pipeline.
+
+Starts the mock OpenAI compatible and Exa servers from mock_servers.py, points the app at them
+through OPENAI_BASE_URL / EXA_BASE_URL and a temporary config.json (every operation on the
+"openai" service, caches, rate limits and tracing off), then measures:
+
+- execute_queries: one batch of search queries
+- execute_plan: the whole plan at several plan widths and search concurrency levels
+- main: the full `python app.py` flow in a subprocess, answering the follow-ups through stdin
+
+and reports throughput, p50 / p95 latency and peak memory for each scenario.
+
+Usage: python benchmarks/run_benchmarks.py --widths 3 5 10 --concurrency 2 8 32 --repeats 5
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_servers import LatencyDistribution, MockServers, MockState
+
+MOCK_MODEL = "mock-model"
+
+def percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def write_benchmark_config(work_dir: str) -> str:
+    """Copy config.json with every operation routed to the mock server and the caches turned off."""
+    with open(os.path.join(BACKEND_DIR, "config.json"), "r") as file:
+        config = json.load(file)
+    for operation in config["ai_providers"]:
+        config["ai_providers"][operation] = "openai"
+        config["models"]["openai"][operation] = MOCK_MODEL
+    config["search"].update({"provider": "exa", "backends": ["exa"], "mode": "single"})
+    config["search"]["cache"] = {"enabled": False, "path": None}
+    config["llm_cache"] = {"enabled": False, "path": None}
+    config["rate_limits"] = {}
+    config["concurrency_limits"] = {}
+    config["tracing"] = {"enabled": False}
+    config["settings"].update({
+        "followup_iterations": 1,
+        "stream_report": False,
+        # Speculation only starts in the interactive follow-up loop, i.e. in the main scenario, where its
+        # background plan would add searches and LLM calls of its own to the measured run
+        "speculative_planning": False,
+        "report_save_path": os.path.join(work_dir, "reports"),
+        "runs_path": os.path.join(work_dir, "runs")
+    })
+    path = os.path.join(work_dir, "benchmark_config.json")
+    with open(path, "w") as file:
+        json.dump(config, file, indent=2)
+    return path
+
+def measure(name: str, repeats: int, run: Callable[[], Any], state: MockState) -> Dict[str, Any]:
+    """
+    Run a scenario `repeats` times, recording latency, upstream call throughput and peak Python memory.
+
+    An unrecorded warm-up run comes first, so lazy imports, client creation and connection setup
+    are not charged to whichever scenario happens to run first.
+    """
+    run()
+    latencies = []
+    calls_before = dict(state.counts)
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        run_start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - run_start)
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    searches = state.counts["search"] - calls_before["search"]
+    chats = state.counts["chat"] - calls_before["chat"]
+    return {
+        "scenario": name,
+        "runs": repeats,
+        "runs_per_second": repeats / wall,
+        "searches_per_second": searches / wall,
+        "llm_calls_per_second": chats / wall,
+        "p50_seconds": statistics.median(latencies),
+        "p95_seconds": percentile(latencies, 95),
+        "peak_memory_mb": peak / 2 ** 20
+    }
+
+def measure_main(repeats: int, env: Dict[str, str], state: MockState) -> Dict[str, Any]:
+    """
+    Run the interactive entry point end to end, answering the query and the follow-up through stdin.
+
+    Every run is a fresh process, the unrecorded warm-up run only fills the OS file cache.
+    """
+    def run_main():
+        subprocess.run(
+            [sys.executable, "app.py"], cwd=BACKEND_DIR, env=env, check=True,
+            input="Analyze the global EV market in 2024\nFocus on Europe and 2023-2024\n",
+            text=True, stdout=subprocess.DEVNULL
+        )
+
+    run_main()
+    latencies = []
+    calls_before = dict(state.counts)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        run_start = time.perf_counter()
+        run_main()
+        latencies.append(time.perf_counter() - run_start)
+    wall = time.perf_counter() - start
+    return {
+        "scenario": "main (app.py subprocess)",
+        "runs": repeats,
+        "runs_per_second": repeats / wall,
+        "searches_per_second": (state.counts["search"] - calls_before["search"]) / wall,
+        "llm_calls_per_second": (state.counts["chat"] - calls_before["chat"]) / wall,
+        "p50_seconds": statistics.median(latencies),
+        "p95_seconds": percentile(latencies, 95),
+        # Peak resident set size of the subprocesses, including the interpreter itself
+        "peak_memory_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    }
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    columns = ["scenario", "runs", "runs_per_second", "searches_per_second", "llm_calls_per_second",
+               "p50_seconds", "p95_seconds", "peak_memory_mb"]
+    widths = [max(len(column), *(len(f"{row[column]:.3f}" if isinstance(row[column], float) else str(row[column])) for row in results)) for column in columns]
+    lines = ["  ".join(column.ljust(width) for column, width in zip(columns, widths))]
+    for row in results:
+        lines.append("  ".join(
+            (f"{row[column]:.3f}" if isinstance(row[column], float) else str(row[column])).ljust(width)
+            for column, width in zip(columns, widths)
+        ))
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--widths", type=int, nargs="+", default=[3, 5, 10], help="plan widths (number of steps)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[2, 8, 32], help="max_concurrent_searches levels")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per scenario")
+    parser.add_argument("--queries", type=int, default=15, help="queries in the execute_queries scenario")
+    parser.add_argument("--llm-latency", type=json.loads, default={"kind": "lognormal", "median": 0.2, "sigma": 0.4},
+                        help="latency distribution of the mock chat endpoint, as JSON")
+    parser.add_argument("--search-latency", type=json.loads, default={"kind": "lognormal", "median": 0.15, "sigma": 0.6},
+                        help="latency distribution of the mock Exa endpoint, as JSON")
+    parser.add_argument("--skip-main", action="store_true", help="do not benchmark the full app.py flow")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    state = MockState(LatencyDistribution.parse(args.llm_latency), LatencyDistribution.parse(args.search_latency))
+    with tempfile.TemporaryDirectory() as work_dir, MockServers(state) as servers:
+        env = dict(os.environ)
+        env.update({
+            "CONFIG_PATH": write_benchmark_config(work_dir),
+            "OPENAI_BASE_URL": servers.openai_base_url,
+            "OPENAI_API_KEY": "mock",
+            "EXA_BASE_URL": servers.exa_base_url,
+            "EXA_API_KEY": "mock"
+        })
+        # app.py reads the environment and config.json at import time
+        os.environ.update(env)
+        import app
+
+        results = []
+        queries = [f"benchmark query {i}" for i in range(args.queries)]
+        results.append(measure(f"execute_queries ({args.queries} queries)", args.repeats, lambda: app.execute_queries(queries), state))
+
+        for width in args.widths:
+            state.plan_width = width
+            plan_steps = {f"step {i}": f"Research aspect {i} of the benchmark topic" for i in range(1, width + 1)}
+            for concurrency in args.concurrency:
+                app.config["settings"]["max_concurrent_searches"] = concurrency
+                results.append(measure(
+                    f"execute_plan (width {width}, concurrency {concurrency})", args.repeats,
+                    lambda: app.execute_plan(plan_steps, verbose = False), state
+                ))
+
+        if not args.skip_main:
+            state.plan_width = 5
+            results.append(measure_main(args.repeats, env, state))
+
+    print(format_table(results))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Startup time benchmark for app.py.
+
+Compares importing app.py against importing every provider SDK up front, which is what app.py
+used to do before the clients were created lazily. Each measurement runs in a fresh interpreter.
+
+Usage: python benchmarks/startup_time.py [--runs 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "eager SDK imports (exa_py, google.genai, groq, openai)": "import exa_py, google.genai, groq, openai",
+    "import app": "import app",
+}
+
+def time_import(statement: str, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=BACKEND_DIR, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreter runs per case")
+    args = parser.parse_args()
+
+    baseline = min(time_import("pass", args.runs))
+    print(f"{'case':<60} {'median':>10} {'min':>10}")
+    print(f"{'bare interpreter':<60} {baseline * 1000:>8.1f}ms {baseline * 1000:>8.1f}ms")
+    for name, statement in CASES.items():
+        timings = time_import(statement, args.runs)
+        print(f"{name:<60} {statistics.median(timings) * 1000:>8.1f}ms {min(timings) * 1000:>8.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Sentinel returned on cache misses, since None (or {}) can be a legitimate cached value
+MISS = object()
+
+def make_cache_key(*parts: Any) -> str:
+    """Build a stable key from JSON serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LRUCache:
+    """Thread safe in-memory LRU cache with a per-entry expiry time."""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteCache:
+    """On-disk cache of JSON values with expiry and least-recently-used eviction."""
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def get(self, key: str) -> tuple[Any, float]:
+        """Return (value, expires_at), or (MISS, 0) when the key is missing or expired."""
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return MISS, 0
+            value, expires_at = row
+            if expires_at < now:
+                self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return MISS, 0
+            self._connection.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value), expires_at
+
+    def set(self, key: str, value: Any, expires_at: float):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        self._connection.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count > self.max_entries:
+            self._connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM cache")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+class TieredCache:
+    """
+    Two tier cache: an in-memory LRU in front of an optional SQLite store.
+
+    Disk hits are promoted to memory. Values must be JSON serializable.
+    """
+
+    def __init__(self, ttl_seconds: float = 7 * 24 * 3600, max_memory_entries: int = 1000,
+                 disk_path: Optional[str] = None, max_disk_entries: int = 50000):
+        self.ttl_seconds = ttl_seconds
+        self.memory = LRUCache(max_memory_entries)
+        self.disk = SQLiteCache(disk_path, max_disk_entries) if disk_path else None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "bypassed": 0}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any], base_dir: str, default_path: str) -> "TieredCache":
+        """Build a cache from a config.json section, resolving relative disk paths against base_dir."""
+        disk_path = cache_config.get("path", default_path)
+        if disk_path and not os.path.isabs(disk_path):
+            disk_path = os.path.join(base_dir, disk_path)
+        return cls(
+            ttl_seconds=cache_config.get("ttl_seconds", 7 * 24 * 3600),
+            max_memory_entries=cache_config.get("max_memory_entries", 1000),
+            disk_path=disk_path or None,
+            max_disk_entries=cache_config.get("max_disk_entries", 50000)
+        )
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def get(self, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is not MISS:
+            self._count("memory_hits")
+            return value
+        if self.disk is not None:
+            value, expires_at = self.disk.get(key)
+            if value is not MISS:
+                self.memory.set(key, value, expires_at)
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return MISS
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        expires_at = time.time() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        self.memory.set(key, value, expires_at)
+        if self.disk is not None:
+            self.disk.set(key, value, expires_at)
+        self._count("writes")
+
+    def record_bypass(self):
+        self._count("bypassed")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus the overall hit rate."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+STAGES_FILE = "stages.jsonl"
+STEPS_FILE = "steps.jsonl"
+SEARCHES_FILE = "searches.jsonl"
+SOURCES_FILE = "sources.jsonl"
+
+class RunCheckpoint:
+    """
+    Append-only checkpoint of a research run, stored as JSON lines in runs/<run_id>/.
+
+    - stages.jsonl: one record per completed pipeline stage (query, followup, research_plan, ...)
+    - steps.jsonl: one record per completed plan step
+    - searches.jsonl: one record per completed web search
+    - sources.jsonl: one record per source interned in the run's source store
+
+    A line that was cut off by a crash is ignored when the run is loaded again, and dropped
+    before the next record is appended to its file.
+    """
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        self.run_id = os.path.basename(run_dir)
+        self._lock = threading.Lock()
+        os.makedirs(run_dir, exist_ok=True)
+
+    @classmethod
+    def create(cls, runs_path: str) -> "RunCheckpoint":
+        run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        return cls(os.path.join(runs_path, run_id))
+
+    @classmethod
+    def resume(cls, runs_path: str, run_id: str) -> "RunCheckpoint":
+        run_dir = os.path.join(runs_path, run_id)
+        if not os.path.isdir(run_dir):
+            raise FileNotFoundError(f"No checkpoint found for run {run_id} in {runs_path}")
+        return cls(run_dir)
+
+    def _drop_torn_line(self, file):
+        """Truncate a file that a crash left without a final newline back to its last complete line."""
+        end = file.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        file.seek(end - 1)
+        if file.read(1) == b"\n":
+            return
+        position = end
+        while position > 0:
+            block_start = max(0, position - 4096)
+            file.seek(block_start)
+            newline = file.read(position - block_start).rfind(b"\n")
+            if newline != -1:
+                file.truncate(block_start + newline + 1)
+                return
+            position = block_start
+        file.truncate(0)
+
+    def _append(self, filename: str, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(os.path.join(self.run_dir, filename), "a+b") as file:
+                # Otherwise the new record would be glued onto the torn one and lost with it
+                self._drop_torn_line(file)
+                file.write((line + "\n").encode("utf-8"))
+                file.flush()
+                os.fsync(file.fileno())
+
+    def _read(self, filename: str) -> list[Dict[str, Any]]:
+        path = os.path.join(self.run_dir, filename)
+        if not os.path.exists(path):
+            return []
+        records = []
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records
+
+    def save_stage(self, stage: str, data: Any):
+        self._append(STAGES_FILE, {"stage": stage, "data": data})
+
+    def load_stage(self, stage: str) -> Optional[Any]:
+        """Return the data of a completed stage, or None if it has not completed yet."""
+        data = None
+        for record in self._read(STAGES_FILE):
+            if record.get("stage") == stage:
+                data = record.get("data")
+        return data
+
+    def record_step(self, step: str, result: Dict):
+        # Steps with failed searches stay incomplete, a resumed run only redoes the failed searches
+        search_results = result.get("search_results", {}).get("queries", {})
+        if not any("error" in search_result for search_result in search_results.values()):
+            self._append(STEPS_FILE, {"step": step, "result": result})
+
+    def completed_steps(self) -> Dict[str, Dict]:
+        return {record["step"]: record["result"] for record in self._read(STEPS_FILE) if "step" in record}
+
+    def record_search(self, query: str, result: Dict):
+        # Failed searches are not checkpointed so that a resumed run retries them
+        if "error" not in result:
+            self._append(SEARCHES_FILE, {"query": query, "result": result})
+
+    def completed_searches(self) -> Dict[str, Dict]:
+        return {record["query"]: record["result"] for record in self._read(SEARCHES_FILE) if "query" in record}
+
+    def record_source(self, source: Dict):
+        self._append(SOURCES_FILE, source)
+
+    def sources(self) -> list[Dict[str, Any]]:
+        return [record for record in self._read(SOURCES_FILE) if "id" in record]
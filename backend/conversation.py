@@ -0,0 +1,68 @@
+from typing import Dict, List, Optional
+
+from report_synthesis import CHARS_PER_TOKEN, estimate_tokens
+
+# Share of the budget (after the query) that the most recent turns may use verbatim
+RECENT_TURNS_SHARE = 0.75
+# Older turns are condensed to a "question -> answer" line of at most this many characters
+SUMMARY_LINE_CHARS = 200
+
+class ConversationState:
+    """
+    The research query and its follow-up turns, each turn stored once.
+
+    Prompts are rendered from the state within a token budget: the most recent turns verbatim,
+    older ones condensed to one line each, and the oldest lines dropped once even those do not
+    fit. Condensing is done locally and stops at the budget, so the prompt size and the cost
+    of a follow-up turn stay flat however many iterations there are.
+    """
+
+    def __init__(self, initial_query: str, turns: Optional[List[Dict[str, str]]] = None):
+        self.initial_query = initial_query
+        self.turns = turns if turns is not None else []
+
+    def add_turn(self, question: str, answer: str):
+        self.turns.append({"iteration": len(self.turns) + 1, "question": question, "answer": answer})
+
+    @staticmethod
+    def format_turn(turn: Dict[str, str]) -> str:
+        return f"Follow-up Q: {turn['question']} Follow-up A: {turn['answer']}"
+
+    @staticmethod
+    def summarize_turn(turn: Dict[str, str]) -> str:
+        line = f"- {turn['question']} -> {turn['answer']}"
+        return line if len(line) <= SUMMARY_LINE_CHARS else line[:SUMMARY_LINE_CHARS - 3] + "..."
+
+    def render(self, max_tokens: int) -> str:
+        """The query followed by as much of the conversation as fits in max_tokens."""
+        budget = max(0, max_tokens - estimate_tokens(self.initial_query)) * CHARS_PER_TOKEN
+        recent_budget = int(budget * RECENT_TURNS_SHARE)
+
+        # Newest turns first, verbatim until they no longer fit
+        index = len(self.turns)
+        recent, used = [], 0
+        while index > 0:
+            text = self.format_turn(self.turns[index - 1])
+            if used + len(text) + 1 > recent_budget:
+                break
+            recent.append(text)
+            used += len(text) + 1
+            index -= 1
+
+        # Then the older turns, one line each, with whatever budget is left
+        summary = []
+        while index > 0:
+            line = self.summarize_turn(self.turns[index - 1])
+            if used + len(line) + 1 > budget:
+                break
+            summary.append(line)
+            used += len(line) + 1
+            index -= 1
+
+        parts = [self.initial_query]
+        if index > 0:
+            parts.append(f"({index} earlier follow-ups omitted)")
+        if summary:
+            parts.append("Earlier follow-ups:\n" + "\n".join(reversed(summary)))
+        parts.extend(reversed(recent))
+        return "\n".join(parts)
@@ -1,22 +1,174 @@
 import re
 import json
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+# Characters that matter when looking for balanced objects, everything else is skipped over
+_SIGNIFICANT = re.compile(r'[{}"\\]')
+_DANGLING_KEY = re.compile(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*$')
+
+class JsonScanner:
+    """
+    Finds complete top-level JSON objects in text that arrives in chunks.
+
+    Braces inside strings are ignored and text around the objects (prose, code fences, braces
+    in trailing explanations) is skipped. Each chunk is scanned once, so feeding a streamed
+    completion costs no more than scanning it whole.
+    """
+
+    def __init__(self):
+        self._pending: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """Scan the next chunk, returning the objects it completes."""
+        objects = []
+        start = 0 if self._depth > 0 else None
+        skip = 0 if self._escaped else -1
+        for match in _SIGNIFICANT.finditer(chunk):
+            index, char = match.start(), match.group()
+            if index == skip:
+                continue
+            if self._in_string:
+                if char == "\\":
+                    skip = index + 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == "{":
+                if self._depth == 0:
+                    start = index
+                self._depth += 1
+            elif self._depth == 0:
+                continue
+            elif char == '"':
+                self._in_string = True
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pending.append(chunk[start:index + 1])
+                    objects.append("".join(self._pending))
+                    self._pending = []
+                    start = None
+        if self._depth > 0:
+            self._pending.append(chunk[start:])
+        self._escaped = skip == len(chunk)
+        return objects
+
+    @property
+    def remainder(self) -> str:
+        """The object still open at the end of the input, e.g. when the output was truncated."""
+        return "".join(self._pending)
+
+def repair_json(text: str) -> str:
+    """
+    Fix the defects LLMs commonly produce: trailing commas, and output cut off in the middle
+    (unterminated strings, dangling keys, unclosed objects and arrays).
+    """
+    output: List[str] = []
+    stack: List[str] = []
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            output.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            # Drop a trailing comma before the closing bracket
+            while output and output[-1].isspace():
+                output.pop()
+            if output and output[-1] == ",":
+                output.pop()
+            if stack:
+                stack.pop()
+        output.append(char)
+
+    repaired = "".join(output)
+    if in_string:
+        repaired = repaired[:-1] if escaped else repaired
+        repaired += '"'
+    repaired = repaired.rstrip().rstrip(",").rstrip()
+    if stack and stack[-1] == "}":
+        # A key without its value, with or without its colon, is dropped
+        repaired = repaired.rstrip(":").rstrip()
+        repaired = _DANGLING_KEY.sub(lambda match: match.group(1), repaired).rstrip().rstrip(",")
+    return repaired + "".join(reversed(stack))
+
+def parse_json(text: str) -> Any:
+    """json.loads, falling back to a repaired copy of the text."""
+    try:
+        return json.loads(text, strict=False)
+    except json.JSONDecodeError:
+        return json.loads(repair_json(text), strict=False)
+
+class StructuredOutputParser:
+    """
+    Parses the first JSON object that matches a schema out of a completion, either whole or
+    streamed chunk by chunk. With a streamed completion the result is available as soon as
+    the object closes.
+    """
+
+    def __init__(self, schema: Optional[Type[BaseModel]] = None):
+        self.schema = schema
+        self.scanner = JsonScanner()
+        self.result: Optional[Dict] = None
+        self.errors: List[str] = []
+
+    def _validate(self, text: str) -> Optional[Dict]:
+        try:
+            data = parse_json(text)
+        except json.JSONDecodeError as error:
+            self.errors.append(f"invalid JSON: {error}")
+            return None
+        if self.schema is None:
+            return data
+        try:
+            return self.schema.model_validate(data).model_dump()
+        except ValidationError as error:
+            self.errors.append(f"does not match {self.schema.__name__}: {error}")
+            return None
+
+    def feed(self, chunk: str) -> Optional[Dict]:
+        if self.result is None:
+            for candidate in self.scanner.feed(chunk):
+                self.result = self._validate(candidate)
+                if self.result is not None:
+                    break
+        return self.result
+
+    def close(self) -> Dict:
+        """The parsed result once the whole completion was fed, repairing an object cut off at the end."""
+        if self.result is None and self.scanner.remainder:
+            self.result = self._validate(self.scanner.remainder)
+        if self.result is None:
+            raise ValueError(f"No valid JSON object found ({'; '.join(self.errors) or 'no object in output'})")
+        return self.result
 
 # This is for custom models that do not directly support the response_format for chat completion
-def extract_json_from_response(content: str):
-    # Try to find JSON between tags if the model adds them
+def extract_json_from_response(content: str, schema: Optional[Type[BaseModel]] = None):
+    # Try the JSON between tags first if the model adds them, then the whole response
+    candidates = [content]
     json_match = re.search(r'<json>(.*?)</json>', content, re.DOTALL)
     if json_match:
+        candidates.insert(0, json_match.group(1))
+
+    for candidate in candidates:
+        parser = StructuredOutputParser(schema)
+        parser.feed(candidate)
         try:
-            return json.loads(json_match.group(1).strip())
-        except json.JSONDecodeError:
-            pass
-    
-    # Try to find anything that looks like a JSON object
-    json_match = re.search(r'\{.*\}', content, re.DOTALL)
-    if json_match:
-        try:
-            return json.loads(json_match.group(0))
-        except json.JSONDecodeError:
-            pass
-    
-    raise ValueError(f"Failed to parse valid json response from inputs: {content}")
\ No newline at end of file
+            return parser.close()
+        except ValueError:
+            continue
+
+    raise ValueError(f"Failed to parse valid json response from inputs: {content}")
@@ -1,13 +1,20 @@
 from google import genai
 from google.genai import types
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, Iterator
 
-from prompts import FOLLOWUP_PROMPT, RESEARCH_PLAN_PROMPT, GEN_QUERY_PROMPT, GEN_REPORT_PROMPT
+from prompts import FOLLOWUP_PROMPT, RESEARCH_PLAN_PROMPT, GEN_QUERY_PROMPT, GEN_REPORT_PROMPT, SUMMARIZE_LEARNINGS_PROMPT
+from tracing import annotate
 
 class ReportResponse(BaseModel):
     reportMarkdown: str
 
+def _record_usage(response):
+    """Attach the token usage reported by the API to the active tracing span."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        annotate(prompt_tokens=usage.prompt_token_count, completion_tokens=usage.candidates_token_count)
+
 def generate_followup(client: genai.Client, model: str, context: str) -> Dict:
     # Implementation here
     raise NotImplementedError()
@@ -30,10 +37,37 @@ def generate_report(client: genai.Client, model: str, prompt: str, learnings: st
         contents=[
             f"Given the following prompt from the user, write a final report on the topic using "
             f"the learnings from research. Return a JSON object with a 'reportMarkdown' field "
-            f"containing a detailed markdown report (aim for 3+ pages). Include ALL the learnings. use the text field corresponding to the query.The report should be very detailed with inline citations in markdown format :- (text)[source link] in each subsection "
+            f"containing a detailed markdown report (aim for 3+ pages). Include ALL the learnings. use the source texts listed at the end of the learnings.The report should be very detailed with inline citations in each subsection, using the source ids such as [S3] right after the facts they support "
             f"from research:\n\n<prompt>{prompt}</prompt>\n\n"
             f"Here are all the learnings from research:\n\n<learnings>\n{learnings}\n</learnings>"
         ]
     )
+    _record_usage(response)
     report_response = ReportResponse.parse_raw(response.text)
-    return report_response.reportMarkdown
\ No newline at end of file
+    return report_response.reportMarkdown
+
+def stream_report(client: genai.Client, model: str, prompt: str, learnings: str) -> Iterator[str]:
+    # Structured JSON output cannot be consumed incrementally, so the streamed report is plain markdown
+    stream = client.models.generate_content_stream(
+        model=model,
+        contents=[GEN_REPORT_PROMPT.format(prompt=prompt, learnings=learnings)]
+    )
+    chunk = None
+    for chunk in stream:
+        if chunk.text:
+            yield chunk.text
+    # Every chunk carries the usage so far, the last one covers the whole stream
+    if chunk is not None:
+        _record_usage(chunk)
+
+def summarize_learnings(client: genai.Client, model: str, plan_step: str, learnings: str) -> str:
+    response = client.models.generate_content(
+        model=model,
+        config=types.GenerateContentConfig(
+            system_instruction=SUMMARIZE_LEARNINGS_PROMPT.format(plan_step=plan_step),
+            temperature=0.2,
+        ),
+        contents=[learnings]
+    )
+    _record_usage(response)
+    return response.text
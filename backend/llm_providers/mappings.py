@@ -1,30 +1,43 @@
 from typing import Dict, Callable, Any
-import llm_providers.google_genai_impl as google_genai_impl
-import llm_providers.openai_impl as openai_impl
+from llm_providers.registry import LazyFunction
 
 # We do not set the types of the callable since the code structure is not yet stable
+# The implementation modules (and the SDKs they import) are only loaded when a function is first called
+OPENAI_IMPL = "llm_providers.openai_impl"
+GOOGLE_GENAI_IMPL = "llm_providers.google_genai_impl"
 
 GENERATE_FOLLOWUP: Dict[str, Callable[..., Any]] = {
-    "openai": openai_impl.generate_followup,
-    "groq": openai_impl.generate_followup,
-    "gemini": google_genai_impl.generate_followup
+    "openai": LazyFunction(OPENAI_IMPL, "generate_followup"),
+    "groq": LazyFunction(OPENAI_IMPL, "generate_followup"),
+    "gemini": LazyFunction(GOOGLE_GENAI_IMPL, "generate_followup")
 }
 
 GENERATE_RESEARCH_PLAN: Dict[str, Callable[..., Any]] = {
-    "openai": openai_impl.generate_research_plan,
-    "groq": openai_impl.generate_research_plan,
-    "gemini": google_genai_impl.generate_research_plan
+    "openai": LazyFunction(OPENAI_IMPL, "generate_research_plan"),
+    "groq": LazyFunction(OPENAI_IMPL, "generate_research_plan"),
+    "gemini": LazyFunction(GOOGLE_GENAI_IMPL, "generate_research_plan")
 }
 
 GENERATE_QUERIES_FOR_STEP: Dict[str, Callable[..., Any]] = {
-    "openai": openai_impl.generate_queries_for_step,
-    "groq": openai_impl.generate_queries_for_step,
-    "gemini": google_genai_impl.generate_queries_for_step
+    "openai": LazyFunction(OPENAI_IMPL, "generate_queries_for_step"),
+    "groq": LazyFunction(OPENAI_IMPL, "generate_queries_for_step"),
+    "gemini": LazyFunction(GOOGLE_GENAI_IMPL, "generate_queries_for_step")
 }
 
 GENERATE_REPORT: Dict[str, Callable[..., Any]] = {
-    "openai": openai_impl.generate_report,
-    "groq": openai_impl.generate_report,
-    "gemini": google_genai_impl.generate_report
+    "openai": LazyFunction(OPENAI_IMPL, "generate_report"),
+    "groq": LazyFunction(OPENAI_IMPL, "generate_report"),
+    "gemini": LazyFunction(GOOGLE_GENAI_IMPL, "generate_report")
 }
 
+STREAM_REPORT: Dict[str, Callable[..., Any]] = {
+    "openai": LazyFunction(OPENAI_IMPL, "stream_report"),
+    "groq": LazyFunction(OPENAI_IMPL, "stream_report"),
+    "gemini": LazyFunction(GOOGLE_GENAI_IMPL, "stream_report")
+}
+
+SUMMARIZE_LEARNINGS: Dict[str, Callable[..., Any]] = {
+    "openai": LazyFunction(OPENAI_IMPL, "summarize_learnings"),
+    "groq": LazyFunction(OPENAI_IMPL, "summarize_learnings"),
+    "gemini": LazyFunction(GOOGLE_GENAI_IMPL, "summarize_learnings")
+}
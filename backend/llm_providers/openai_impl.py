@@ -1,9 +1,16 @@
 from openai import OpenAI
-from typing import Dict
-import json
+from typing import Dict, Iterator
 
-from prompts import FOLLOWUP_PROMPT, RESEARCH_PLAN_PROMPT, GEN_QUERY_PROMPT, GEN_REPORT_PROMPT
+from prompts import FOLLOWUP_PROMPT, RESEARCH_PLAN_PROMPT, GEN_QUERY_PROMPT, GEN_REPORT_PROMPT, SUMMARIZE_LEARNINGS_PROMPT
 from json_extraction import extract_json_from_response
+from llm_providers.schemas import FollowupResponse, ResearchPlan, StepQueries
+from tracing import annotate
+
+def _record_usage(completion):
+    """Attach the token usage reported by the API to the active tracing span."""
+    usage = getattr(completion, "usage", None)
+    if usage is not None:
+        annotate(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
 
 # OpenAI/Groq implementations
 def generate_followup(client: OpenAI, model: str, context: str) -> Dict:
@@ -15,10 +22,12 @@ def generate_followup(client: OpenAI, model: str, context: str) -> Dict:
         ],
         response_format={"type": "json_object"},
     )
-    return extract_json_from_response(completion.choices[0].message.content)
+    _record_usage(completion)
+    return extract_json_from_response(completion.choices[0].message.content, FollowupResponse)
 
 def generate_research_plan(client: OpenAI, model: str, initial_query: str, followup_context: str) -> Dict:
-    combined_context = initial_query + followup_context
+    # The follow-up context already starts with the query, only add it when it does not
+    combined_context = followup_context if followup_context.startswith(initial_query) else f"{initial_query}\n{followup_context}"
     completion = client.chat.completions.create(
         model=model,
         messages=[
@@ -27,7 +36,8 @@ def generate_research_plan(client: OpenAI, model: str, initial_query: str, follo
         ],
         response_format={"type": "json_object"},
     )
-    return extract_json_from_response(completion.choices[0].message.content)
+    _record_usage(completion)
+    return extract_json_from_response(completion.choices[0].message.content, ResearchPlan)
 
 def generate_queries_for_step(client: OpenAI, model: str, step: str, description: str) -> Dict:
     # Implementation here
@@ -40,34 +50,68 @@ def generate_queries_for_step(client: OpenAI, model: str, step: str, description
             ],
             response_format={"type": "json_object"},
         )
-        queries = extract_json_from_response(completion.choices[0].message.content)
+        _record_usage(completion)
+        queries = extract_json_from_response(completion.choices[0].message.content, StepQueries)
         # Write the generated queries to the output file
         # write_output_to_file(f"### Generated Queries for {step}\n" + json.dumps(queries, indent=2))
         return {step: queries}
-    except json.JSONDecodeError:
+    except ValueError:
         return {step: {"error": "Failed to generate queries"}}
 
 def generate_report(client: OpenAI, model: str, prompt: str, learnings: str) -> str:
     """Generate a detailed markdown report using OpenAI."""
-    try:
-        # Format the prompt with the user's query and research learnings
-        formatted_prompt = GEN_REPORT_PROMPT.format(
-            prompt=prompt,
-            learnings=learnings
-        )
-        
-        # Call the OpenAI API
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a professional research analyst."},
-                {"role": "user", "content": formatted_prompt}
-            ],
-            temperature=0.5,  # Adjust for creativity vs. consistency
-        )
-        
-        # Extract and return the report content
-        return completion.choices[0].message.content
-    except Exception as e:
-        print(f"Error generating report with OpenAI: {e}")
-        return f"Error generating report: {e}"
\ No newline at end of file
+    # Errors are raised rather than returned as the report, so that the rate limiter can retry them
+    # Format the prompt with the user's query and research learnings
+    formatted_prompt = GEN_REPORT_PROMPT.format(
+        prompt=prompt,
+        learnings=learnings
+    )
+    
+    # Call the OpenAI API
+    completion = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": "You are a professional research analyst."},
+            {"role": "user", "content": formatted_prompt}
+        ],
+        temperature=0.5,  # Adjust for creativity vs. consistency
+    )
+    _record_usage(completion)
+    
+    # Extract and return the report content
+    return completion.choices[0].message.content
+
+def stream_report(client: OpenAI, model: str, prompt: str, learnings: str) -> Iterator[str]:
+    """Stream the markdown report chunk by chunk as the model generates it."""
+    formatted_prompt = GEN_REPORT_PROMPT.format(
+        prompt=prompt,
+        learnings=learnings
+    )
+    stream = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": "You are a professional research analyst."},
+            {"role": "user", "content": formatted_prompt}
+        ],
+        temperature=0.5,
+        stream=True,
+        # Adds a last chunk, without choices, carrying the token usage of the whole stream
+        stream_options={"include_usage": True},
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+        _record_usage(chunk)
+
+def summarize_learnings(client: OpenAI, model: str, plan_step: str, learnings: str) -> str:
+    """Condense a chunk of learnings for one plan step into short notes."""
+    completion = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SUMMARIZE_LEARNINGS_PROMPT.format(plan_step=plan_step)},
+            {"role": "user", "content": learnings}
+        ],
+        temperature=0.2,
+    )
+    _record_usage(completion)
+    return completion.choices[0].message.content
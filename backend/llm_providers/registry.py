@@ -0,0 +1,80 @@
+import importlib
+import os
+import threading
+from typing import Any, Callable, Dict
+
+# SDK imports live inside the factories so only the providers that are actually used get imported
+# The SDKs' own retries are turned off, retries and backoff are handled by rate_limit.RateLimiter
+
+def _create_openai_client() -> Any:
+    from openai import OpenAI
+    # If OPENAI_BASE_URL is not set OpenAI will be used
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL") or None, max_retries=0)
+
+def _create_groq_client() -> Any:
+    from groq import Groq
+    return Groq(api_key=os.getenv("GROQ_API_KEY", ""), max_retries=0)
+
+def _create_gemini_client() -> Any:
+    from google import genai
+    return genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+
+# Environment variables that point a service at another server, e.g. an OpenAI compatible one
+BASE_URL_VARIABLES = {
+    "openai": "OPENAI_BASE_URL"
+}
+
+CLIENT_FACTORIES: Dict[str, Callable[[], Any]] = {
+    "openai": _create_openai_client,
+    "groq": _create_groq_client,
+    "gemini": _create_gemini_client
+}
+
+class LazyFunction:
+    """Callable that imports its implementation module on the first call."""
+
+    def __init__(self, module: str, name: str):
+        self.__module__ = module
+        self.__name__ = name
+        self.__qualname__ = name
+        self._function = None
+
+    def resolve(self) -> Callable[..., Any]:
+        if self._function is None:
+            self._function = getattr(importlib.import_module(self.__module__), self.__name__)
+        return self._function
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<lazy {self.__module__}.{self.__name__}>"
+
+class ProviderRegistry:
+    """Creates provider clients on first use and keeps them for the lifetime of the process."""
+
+    def __init__(self, factories: Dict[str, Callable[[], Any]] = None):
+        self.factories = factories if factories is not None else CLIENT_FACTORIES
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def get_client(self, service: str) -> Any:
+        client = self._clients.get(service)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(service)
+                if client is None:
+                    if service not in self.factories:
+                        raise ValueError(f"Unknown provider service: {service}")
+                    client = self.factories[service]()
+                    self._clients[service] = client
+        return client
+
+    def provider_id(self, service: str) -> str:
+        """The service plus the server it talks to, when that server is not the service's default."""
+        variable = BASE_URL_VARIABLES.get(service)
+        base_url = os.getenv(variable) if variable else None
+        return f"{service}@{base_url}" if base_url else service
+
+    def loaded_services(self) -> list[str]:
+        return list(self._clients)
@@ -0,0 +1,111 @@
+import importlib.util
+from functools import lru_cache, wraps
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import prompts
+from cache import MISS, TieredCache, make_cache_key
+
+# The implementations build their messages from these templates plus the call arguments,
+# so hashing the templates together with the arguments keys the cache on the actual messages
+PROMPT_FINGERPRINT = make_cache_key(
+    prompts.FOLLOWUP_PROMPT,
+    prompts.RESEARCH_PLAN_PROMPT,
+    prompts.GEN_QUERY_PROMPT,
+    prompts.GEN_REPORT_PROMPT,
+    prompts.SUMMARIZE_LEARNINGS_PROMPT
+)
+
+@lru_cache(maxsize=None)
+def module_fingerprint(module: str) -> str:
+    """
+    Hash of an implementation module's source. The system messages, the inline prompts (e.g. the
+    Gemini report prompt) and the sampling settings live there, editing any of them starts new entries.
+    The module is not imported, the functions of the mappings tables are loaded lazily.
+    """
+    try:
+        with open(importlib.util.find_spec(module).origin, "rb") as file:
+            return make_cache_key(file.read().decode("utf-8", errors="replace"))
+    except (AttributeError, TypeError, ImportError, OSError):
+        return module
+
+def _is_cacheable(operation: str, result: Any) -> bool:
+    """Failed calls are not cached, some implementations return errors instead of raising."""
+    if operation in ("report_generation", "learnings_summary"):
+        return isinstance(result, str)
+    if operation == "query_generation":
+        return isinstance(result, dict) and not any(
+            isinstance(value, dict) and "error" in value for value in result.values()
+        )
+    return isinstance(result, dict)
+
+def _key_arguments(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: value for name, value in kwargs.items() if name != "client"}
+
+class LLMResponseCache:
+    """Disk backed cache of provider function results, keyed on the inputs of the completion."""
+
+    def __init__(self, cache: TieredCache, enabled: bool = True):
+        self.cache = cache
+        self.enabled = enabled
+
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any], base_dir: str) -> "LLMResponseCache":
+        cache = TieredCache.from_config(cache_config, base_dir, ".cache/llm_cache.sqlite3")
+        return cls(cache, enabled=cache_config.get("enabled", True))
+
+    def key(self, function: Callable[..., Any], service: str, model: str, operation: str, kwargs: Dict[str, Any]) -> str:
+        return make_cache_key(
+            service, model, operation, function.__module__, function.__name__,
+            PROMPT_FINGERPRINT, module_fingerprint(function.__module__), kwargs
+        )
+
+    def wrap(self, function: Callable[..., Any], service: str, operation: str,
+             call: Optional[Callable[..., Any]] = None) -> Callable[..., Any]:
+        """
+        Put the cache in front of a function taken from one of the mappings dispatch tables.
+        On a miss the arguments go to call, e.g. the function behind the rate limiter, which
+        defaults to the function itself. The client argument, if any, is not part of the key, so
+        service should tell providers apart (see ProviderRegistry.provider_id).
+        """
+        call = call or function
+        if not self.enabled:
+            return call
+
+        @wraps(function)
+        def cached_function(model: str, **kwargs) -> Any:
+            key = self.key(function, service, model, operation, _key_arguments(kwargs))
+            cached = self.cache.get(key)
+            if cached is not MISS:
+                return cached
+            result = call(model=model, **kwargs)
+            if _is_cacheable(operation, result):
+                self.cache.set(key, result)
+            return result
+
+        return cached_function
+
+    def wrap_stream(self, function: Callable[..., Iterator[str]], service: str, operation: str,
+                    call: Optional[Callable[..., Iterator[str]]] = None) -> Callable[..., Iterator[str]]:
+        """Like wrap, for streaming functions. Hits are replayed as a single chunk."""
+        call = call or function
+        if not self.enabled:
+            return call
+
+        @wraps(function)
+        def cached_stream(model: str, **kwargs) -> Iterator[str]:
+            key = self.key(function, service, model, operation, _key_arguments(kwargs))
+            cached = self.cache.get(key)
+            if cached is not MISS:
+                yield cached
+                return
+            chunks = []
+            for chunk in call(model=model, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+            # Only streams that ran to completion are cached
+            self.cache.set(key, "".join(chunks))
+
+        return cached_stream
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
@@ -0,0 +1,16 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+# Expected shapes of the JSON outputs, see the prompts in prompts.py
+
+class FollowupResponse(BaseModel):
+    question: str
+    query_context: Optional[str] = None
+
+class ResearchPlan(BaseModel):
+    plan: Dict[str, str] = Field(min_length=1)
+
+class StepQueries(BaseModel):
+    plan_step: Optional[str] = None
+    search_queries: List[str] = Field(min_length=1)
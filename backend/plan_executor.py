@@ -0,0 +1,181 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import inspect
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from query_dedup import QueryDeduplicator
+from source_store import SourceStore
+
+# Both sync and async callables are accepted, sync ones are pushed onto worker threads
+QueryGenerator = Callable[..., Union[Dict, Awaitable[Dict]]]
+SearchFunction = Callable[[str], Union[Dict, Awaitable[Dict]]]
+
+async def call_maybe_async(function: Callable[..., Any], *args, **kwargs) -> Any:
+    """Await a coroutine function directly, or run a blocking function in a worker thread."""
+    if inspect.iscoroutinefunction(function):
+        return await function(*args, **kwargs)
+    return await asyncio.to_thread(function, *args, **kwargs)
+
+def extract_step_queries(step: str, search_queries: Dict) -> List[str]:
+    """Pull the list of search queries for a step out of the query generation output."""
+    if step in search_queries:
+        return search_queries[step].get("search_queries", [])
+    return ["No queries generated"]
+
+def format_search_result(response: Dict, sources: Optional[SourceStore] = None, max_citations: int = 3) -> Dict:
+    """
+    Keep the answer and the top citations of a raw search response. With a source store the
+    citations are interned there and only their ids are kept.
+    """
+    if "error" in response:
+        return {"error": response["error"]}
+    citations = response.get("citations", [])[:max_citations]
+    if sources is not None:
+        source_ids = dict.fromkeys(sources.add(citation) for citation in citations)
+        return {
+            "answer": response.get("answer", "No answer found"),
+            "sources": [source_id for source_id in source_ids if source_id is not None]
+        }
+    return {
+        "answer": response.get("answer", "No answer found"),
+        "top_citations": citations
+    }
+
+async def execute_plan_async(
+    plan_steps: Dict[str, str],
+    generate_queries: QueryGenerator,
+    search: SearchFunction,
+    max_concurrent_searches: int = 8,
+    max_concurrent_llm_calls: int = 5,
+    on_step_complete: Callable[[str, Dict], None] = None,
+    deduplicator: Optional[QueryDeduplicator] = None,
+    completed_steps: Optional[Dict[str, Dict]] = None,
+    completed_searches: Optional[Dict[str, Dict]] = None,
+    on_search_complete: Callable[[str, Dict], None] = None,
+    format_result: Callable[[Dict], Dict] = format_search_result,
+    search_semaphore: Optional[asyncio.Semaphore] = None,
+    llm_semaphore: Optional[asyncio.Semaphore] = None
+) -> Dict:
+    """
+    Execute all steps of the research plan concurrently.
+
+    Queries are generated for every step at once, and each web search starts as soon as
+    the queries of its step arrive instead of waiting for the previous step to finish.
+    Searches and query generation calls are bounded by their own global limits.
+
+    With a deduplicator, near-duplicate queries from different steps share a single search and
+    the fanned-in results are tagged with the "canonical_query" that was actually searched.
+
+    completed_steps and completed_searches come from a checkpoint of an earlier run: completed
+    steps are returned as they are and completed searches are not issued again.
+
+    format_result turns a raw search response into the result kept in the plan output. Like
+    the callbacks, it may block (e.g. on checkpoint writes), so sync ones run in worker threads
+    to keep the loop free for the other plans.
+
+    search_semaphore and llm_semaphore replace the per-plan limits with limits shared by every
+    plan running on the loop (see PlanScheduler).
+    """
+    completed_steps = completed_steps or {}
+    completed_searches = completed_searches or {}
+    search_semaphore = search_semaphore or asyncio.Semaphore(max_concurrent_searches)
+    llm_semaphore = llm_semaphore or asyncio.Semaphore(max_concurrent_llm_calls)
+    searches: Dict[str, asyncio.Task] = {}
+
+    if deduplicator is not None:
+        # Earlier searches become cluster heads so that their duplicates reuse the saved results
+        for query in completed_searches:
+            deduplicator.assign(query)
+
+    async def search_once(query: str) -> Dict:
+        try:
+            async with search_semaphore:
+                response = await call_maybe_async(search, query)
+            # Formatting and recording the result don't hold up the next search
+            result = await call_maybe_async(format_result, response)
+        except Exception as exc:
+            result = {"error": str(exc)}
+        if on_search_complete is not None:
+            await call_maybe_async(on_search_complete, query, result)
+        return result
+
+    async def run_search(query: str) -> Dict:
+        canonical_query = deduplicator.assign(query) if deduplicator is not None else query
+        if canonical_query in completed_searches:
+            result = completed_searches[canonical_query]
+        else:
+            if canonical_query not in searches:
+                searches[canonical_query] = asyncio.ensure_future(search_once(canonical_query))
+            result = await searches[canonical_query]
+        if canonical_query != query:
+            return {**result, "canonical_query": canonical_query}
+        return result
+
+    async def run_step(step: str, description: str) -> Dict:
+        if step in completed_steps:
+            return completed_steps[step]
+        async with llm_semaphore:
+            search_queries = await call_maybe_async(generate_queries, step = step, description = description)
+        queries = extract_step_queries(step, search_queries)
+
+        results = await asyncio.gather(*(run_search(query) for query in queries))
+        step_result = {
+            "plan_step": description,
+            "search_queries": queries,
+            "search_results": {"queries": dict(zip(queries, results))}  # Includes answers and citations
+        }
+        if on_step_complete is not None:
+            await call_maybe_async(on_step_complete, step, step_result)
+        return step_result
+
+    steps = list(plan_steps.items())
+    step_results = await asyncio.gather(*(run_step(step, description) for step, description in steps))
+
+    # Keep the plan order regardless of the completion order
+    return {"plan": {step: result for (step, _), result in zip(steps, step_results)}}
+
+async def _run_in_context(context: contextvars.Context, coroutine: Awaitable[Dict]) -> Dict:
+    # Tasks copy the current context when they are created, so the plan keeps the caller's trace
+    return await context.run(asyncio.ensure_future, coroutine)
+
+class PlanScheduler:
+    """
+    Runs the plans of many concurrent jobs on one long-lived event loop.
+
+    The steps of every active plan compete for the same search and LLM call limits, and the
+    async search transport keeps the loop's connection pool open from one job to the next.
+    run blocks the calling (job) thread until its plan is done.
+
+    Sync searches, query generators and callbacks run on the loop's own pool of max_worker_threads
+    threads (by default one per search and LLM call slot), the asyncio default is sized from the
+    CPU count and would cap the concurrency long before the limits do.
+    """
+
+    def __init__(self, max_concurrent_searches: int = 8, max_concurrent_llm_calls: int = 5, max_worker_threads: Optional[int] = None):
+        self.loop = asyncio.new_event_loop()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers = max_worker_threads or max_concurrent_searches + max_concurrent_llm_calls,
+            thread_name_prefix = "plan-worker"
+        )
+        self.loop.set_default_executor(self.executor)
+        self.search_semaphore = asyncio.Semaphore(max_concurrent_searches)
+        self.llm_semaphore = asyncio.Semaphore(max_concurrent_llm_calls)
+        self._thread = threading.Thread(target=self.loop.run_forever, name="plan-scheduler", daemon=True)
+        self._thread.start()
+
+    def run(self, **kwargs) -> Dict:
+        """execute_plan_async with the shared limits, kwargs are passed through."""
+        coroutine = execute_plan_async(search_semaphore=self.search_semaphore, llm_semaphore=self.llm_semaphore, **kwargs)
+        return asyncio.run_coroutine_threadsafe(_run_in_context(contextvars.copy_context(), coroutine), self.loop).result()
+
+    def call(self, coroutine: Awaitable[Any]) -> Any:
+        """Run another coroutine on the scheduler's loop, e.g. to close its transport."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self.executor.shutdown()
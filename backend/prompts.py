@@ -30,7 +30,7 @@ Return 3 search queries for each step in JSON format as follows:
 
 GEN_REPORT_PROMPT = """You are a professional research analyst. Your task is to generate a detailed 3-page markdown report based on the provided research data.
 
-Given the following prompt from the user, write a final report on the topic using the learnings from research. The report should be very detailed with inline citations in markdown format :- (text)[source link] in each subsection.
+Given the following prompt from the user, write a final report on the topic using the learnings from research. The report should be very detailed with inline citations in each subsection. Sources are referred to by ids such as [S3] and listed with their text at the end of the learnings, cite them with these ids right after the facts they support (e.g. "sales grew 30% in 2024 [S3]"), they are turned into links afterwards.
 
 User Prompt: {prompt}
 
@@ -43,6 +43,13 @@ Your report should:
 3. Provide detailed analysis of the research data
 4. Include ALL the relevant learnings from the provided data
 5. Format the report in clean, professional markdown
-6. Use inline citations to reference sources
+6. Use the inline [S3] style source ids to reference sources
 7. Aim for a comprehensive 3+ page report
-"""
\ No newline at end of file
+"""
+
+SUMMARIZE_LEARNINGS_PROMPT = """You are a research analyst condensing raw web research notes for one step of a research plan. The notes will later be used to write a detailed report, so keep every fact, figure, date, name and source link that is relevant to the plan step, and drop repetition and filler.
+
+Plan step: {plan_step}
+
+Return concise markdown bullet points. Keep the source ids such as [S3] next to the facts they support.
+"""
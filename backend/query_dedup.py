@@ -0,0 +1,54 @@
+import re
+from typing import FrozenSet, List, Tuple
+
+# Words that carry no meaning for a web search, dropped before comparing queries
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "the", "to", "vs", "what", "which", "with"
+})
+
+def query_tokens(query: str) -> FrozenSet[str]:
+    """Normalize a query into its set of meaningful lowercase tokens."""
+    tokens = re.findall(r"[a-z0-9]+", query.lower())
+    return frozenset(token for token in tokens if token not in STOPWORDS)
+
+def token_set_similarity(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    """Jaccard similarity of two token sets."""
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+class QueryDeduplicator:
+    """
+    Clusters search queries across the whole research plan as they arrive.
+
+    "X market size 2025" and "market size of X 2025" normalize to the same tokens and end up in
+    one cluster, whose first query is the canonical one that actually gets searched.
+
+    With the default threshold of 1.0 only queries with the same normalized tokens are merged.
+    Lower thresholds also merge near-duplicates, but long queries that differ in their key
+    entity ("... in Europe" vs "... in China") score high as well and would be merged too.
+    """
+
+    def __init__(self, threshold: float = 1.0):
+        self.threshold = threshold
+        self._clusters: List[Tuple[FrozenSet[str], str]] = []
+        self.query_count = 0
+
+    def assign(self, query: str) -> str:
+        """Return the canonical query of the cluster this query belongs to, opening one if needed."""
+        self.query_count += 1
+        tokens = query_tokens(query)
+        best_query, best_score = None, 0.0
+        for cluster_tokens, canonical_query in self._clusters:
+            score = token_set_similarity(tokens, cluster_tokens)
+            if score > best_score:
+                best_query, best_score = canonical_query, score
+        if best_query is not None and best_score >= self.threshold:
+            return best_query
+        self._clusters.append((tokens, query))
+        return query
+
+    @property
+    def cluster_count(self) -> int:
+        return len(self._clusters)
@@ -0,0 +1,294 @@
+import asyncio
+import random
+import threading
+import time
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional
+
+import httpx
+import requests
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+# Dropped connections, timeouts and truncated responses from the HTTP clients the providers use
+TRANSIENT_ERRORS = (httpx.TransportError, requests.exceptions.RequestException, TimeoutError, ConnectionError)
+# Subclasses of the above that mean the request itself is wrong, retrying won't help
+MALFORMED_REQUEST_ERRORS = (
+    httpx.UnsupportedProtocol,
+    requests.exceptions.URLRequired, requests.exceptions.MissingSchema, requests.exceptions.InvalidSchema,
+    requests.exceptions.InvalidURL, requests.exceptions.InvalidHeader, requests.exceptions.InvalidJSONError
+)
+
+DEFAULT_RETRY = {
+    "max_attempts": 5,
+    "base_delay": 1.0,
+    "max_delay": 30.0
+}
+
+# Marks a stream that ended before its first item
+_END = object()
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """Find the HTTP status code of an error raised by requests, httpx, openai, groq or google-genai."""
+    for attribute in ("status_code", "code"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections are worth retrying."""
+    status_code = get_status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES or 500 <= status_code < 600
+    if isinstance(error, MALFORMED_REQUEST_ERRORS):
+        return False
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    # The provider SDKs wrap these in their own classes (APIConnectionError, APITimeoutError, ...)
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by the server through the Retry-After header, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second, holding at most `capacity` tokens."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit that adapts to observed rate limiting (AIMD).
+
+    Every 429 halves the limit, every success grows it by about one slot per `limit` successes,
+    up to max_concurrency.
+    """
+
+    def __init__(self, max_concurrency: int, min_concurrency: int = 1):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.limit = float(max_concurrency)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self._in_flight < int(self.limit):
+                self._in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            if self.limit < self.max_concurrency:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                self._condition.notify()
+
+    def on_rate_limited(self):
+        with self._condition:
+            self.limit = max(self.min_concurrency, self.limit / 2)
+
+class ProviderLimits:
+    """Token bucket and adaptive concurrency limit of one provider, or one provider model."""
+
+    def __init__(self, requests_per_second: Optional[float] = None, burst: Optional[float] = None,
+                 max_concurrency: Optional[int] = None, min_concurrency: int = 1):
+        self.bucket = TokenBucket(requests_per_second, burst or max(1.0, requests_per_second)) if requests_per_second else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency, min_concurrency) if max_concurrency else None
+
+class RateLimiter:
+    """
+    Shared rate limiting and retry layer for every provider and search call.
+
+    Limits are looked up for the provider ("openai", "exa", ...) and for the provider model
+    ("openai:gpt-4o"), so a call waits on both when both are configured. Retryable failures are
+    retried with jittered exponential backoff, and 429s shrink the concurrency of the limits the
+    call went through.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, Any]] = None, retry: Dict[str, Any] = None):
+        self.limits = {key: ProviderLimits(**options) for key, options in (limits or {}).items()}
+        self.retry = {**DEFAULT_RETRY, **(retry or {})}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RateLimiter":
+        """Build the limiter from the rate_limits, concurrency_limits and retry sections of config.json."""
+        limits = {key: dict(options) for key, options in config.get("rate_limits", {}).items()}
+        for key, max_concurrency in config.get("concurrency_limits", {}).items():
+            limits.setdefault(key, {}).setdefault("max_concurrency", max_concurrency)
+        return cls(limits, config.get("retry"))
+
+    def _limits_for(self, provider: str, model: Optional[str]) -> List[ProviderLimits]:
+        keys = [provider] + ([f"{provider}:{model}"] if model else [])
+        return [self.limits[key] for key in keys if key in self.limits]
+
+    def _count(self, provider: str, name: str):
+        with self._stats_lock:
+            stats = self._stats.setdefault(provider, {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0})
+            stats[name] += 1
+
+    def _record_outcome(self, limits: List[ProviderLimits], provider: str, error: Optional[Exception]):
+        for provider_limits in limits:
+            if provider_limits.concurrency is None:
+                continue
+            if error is None:
+                provider_limits.concurrency.on_success()
+            elif get_status_code(error) == 429:
+                provider_limits.concurrency.on_rate_limited()
+        if error is not None and get_status_code(error) == 429:
+            self._count(provider, "rate_limited")
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        delay = backoff_delay(attempt, self.retry["base_delay"], self.retry["max_delay"])
+        return max(delay, retry_after_seconds(error) or 0.0)
+
+    @contextmanager
+    def _slot(self, limits: List[ProviderLimits]):
+        with ExitStack() as stack:
+            for provider_limits in limits:
+                if provider_limits.concurrency is not None:
+                    provider_limits.concurrency.acquire()
+                    stack.callback(provider_limits.concurrency.release)
+            for provider_limits in limits:
+                if provider_limits.bucket is not None:
+                    time.sleep(provider_limits.bucket.reserve())
+            yield
+
+    @asynccontextmanager
+    async def _async_slot(self, limits: List[ProviderLimits]):
+        acquired = []
+        try:
+            for provider_limits in limits:
+                if provider_limits.concurrency is not None:
+                    # The limits are shared with plain threads, so poll instead of blocking the event loop
+                    delay = 0.005
+                    while not provider_limits.concurrency.try_acquire():
+                        await asyncio.sleep(delay)
+                        delay = min(delay * 2, 0.1)
+                    acquired.append(provider_limits.concurrency)
+            for provider_limits in limits:
+                if provider_limits.bucket is not None:
+                    await asyncio.sleep(provider_limits.bucket.reserve())
+            yield
+        finally:
+            for concurrency in acquired:
+                concurrency.release()
+
+    def call(self, provider: str, model: Optional[str], function: Callable[..., Any], /, *args, **kwargs) -> Any:
+        """
+        Call function within the provider limits, retrying retryable failures. The leading
+        parameters are positional-only, so function may take provider or model keywords itself.
+        """
+        limits = self._limits_for(provider, model)
+        for attempt in range(self.retry["max_attempts"]):
+            self._count(provider, "calls")
+            try:
+                with self._slot(limits):
+                    result = function(*args, **kwargs)
+            except Exception as error:
+                self._record_outcome(limits, provider, error)
+                if not is_retryable(error) or attempt == self.retry["max_attempts"] - 1:
+                    self._count(provider, "failures")
+                    raise
+                self._count(provider, "retries")
+                time.sleep(self._retry_delay(error, attempt))
+                continue
+            self._record_outcome(limits, provider, None)
+            return result
+
+    def stream(self, provider: str, model: Optional[str], function: Callable[..., Iterable[Any]], /, *args, **kwargs) -> Iterator[Any]:
+        """
+        Variant of call for functions returning a stream. The request is opened and retried
+        until its first item arrives, and the concurrency slot is held until the stream is
+        exhausted or closed. A failure later in the stream is not retried, its items are gone.
+        """
+        limits = self._limits_for(provider, model)
+        for attempt in range(self.retry["max_attempts"]):
+            self._count(provider, "calls")
+            slot = ExitStack()
+            try:
+                slot.enter_context(self._slot(limits))
+                items = iter(function(*args, **kwargs))
+                first = next(items, _END)
+            except Exception as error:
+                slot.close()
+                self._record_outcome(limits, provider, error)
+                if not is_retryable(error) or attempt == self.retry["max_attempts"] - 1:
+                    self._count(provider, "failures")
+                    raise
+                self._count(provider, "retries")
+                time.sleep(self._retry_delay(error, attempt))
+                continue
+            self._record_outcome(limits, provider, None)
+            with slot:
+                if first is not _END:
+                    yield first
+                    yield from items
+            return
+
+    async def acall(self, provider: str, model: Optional[str], function: Callable[..., Awaitable[Any]], /, *args, **kwargs) -> Any:
+        """Async variant of call for coroutine functions."""
+        limits = self._limits_for(provider, model)
+        for attempt in range(self.retry["max_attempts"]):
+            self._count(provider, "calls")
+            try:
+                async with self._async_slot(limits):
+                    result = await function(*args, **kwargs)
+            except Exception as error:
+                self._record_outcome(limits, provider, error)
+                if not is_retryable(error) or attempt == self.retry["max_attempts"] - 1:
+                    self._count(provider, "failures")
+                    raise
+                self._count(provider, "retries")
+                await asyncio.sleep(self._retry_delay(error, attempt))
+                continue
+            self._record_outcome(limits, provider, None)
+            return result
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per provider call, retry and rate limit counters, plus the current adaptive limits."""
+        with self._stats_lock:
+            stats = {provider: dict(counters) for provider, counters in self._stats.items()}
+        for key, provider_limits in self.limits.items():
+            if provider_limits.concurrency is not None:
+                stats.setdefault(key, {})["concurrency_limit"] = int(provider_limits.concurrency.limit)
+        return stats
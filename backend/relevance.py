@@ -0,0 +1,140 @@
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from query_dedup import STOPWORDS
+from source_store import SourceStore
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+TOKEN = re.compile(r"[a-z0-9]+")
+
+# (kind, key, sentence index): kind is "answer" (key: query) or "source" (key: source id)
+PassageKey = Tuple[str, str, int]
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text or "") if sentence.strip()]
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+def bm25_scores(passages: List[List[str]], query: List[str], k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """BM25 score of every tokenized passage against the query terms, the passages are the corpus."""
+    terms = {term: column for column, term in enumerate(dict.fromkeys(query))}
+    if not passages or not terms:
+        return np.zeros(len(passages))
+    tf = np.zeros((len(passages), len(terms)))
+    for row, tokens in enumerate(passages):
+        for token in tokens:
+            column = terms.get(token)
+            if column is not None:
+                tf[row, column] += 1
+    lengths = np.array([len(tokens) for tokens in passages], dtype=float)
+    df = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (len(passages) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    return (idf * tf * (k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+def jaccard_matrix(passages: List[List[str]]) -> np.ndarray:
+    """Pairwise Jaccard similarity of the passages' token sets."""
+    vocabulary: Dict[str, int] = {}
+    rows, columns = [], []
+    for row, tokens in enumerate(passages):
+        for token in set(tokens):
+            rows.append(row)
+            columns.append(vocabulary.setdefault(token, len(vocabulary)))
+    incidence = np.zeros((len(passages), max(len(vocabulary), 1)), dtype=np.float32)
+    incidence[rows, columns] = 1
+    intersection = incidence @ incidence.T
+    sizes = incidence.sum(axis=1)
+    union = sizes[:, None] + sizes[None, :] - intersection
+    return intersection / np.maximum(union, 1)
+
+def select_passages(keys: List[PassageKey], texts: List[str], query: str,
+                    byte_budget: int, dedup_threshold: float) -> Set[PassageKey]:
+    """
+    Pick the most relevant passages of one plan step within byte_budget. Near-duplicates of an
+    already picked passage are skipped, and sentences that share no term with the query are
+    dropped. The best sentence of every answer is picked first, so no answer ends up empty.
+    """
+    tokens = [tokenize(text) for text in texts]
+    scores = bm25_scores(tokens, tokenize(query))
+    similarity = jaccard_matrix(tokens)
+    order = sorted(range(len(keys)), key=lambda index: scores[index], reverse=True)
+
+    best_of_answer = {}
+    for index in order:
+        if keys[index][0] == "answer":
+            best_of_answer.setdefault(keys[index][1], index)
+
+    picked: List[int] = []
+    picked_indexes: Set[int] = set()
+    used = 0
+    answer_heads = set(best_of_answer.values())
+    for index in list(best_of_answer.values()) + order:
+        if index in picked_indexes:
+            continue
+        if scores[index] <= 0 and index not in answer_heads:
+            continue
+        if picked and similarity[index, picked].max() >= dedup_threshold:
+            continue
+        size = len(texts[index].encode("utf-8"))
+        if used + size > byte_budget:
+            continue
+        picked.append(index)
+        picked_indexes.add(index)
+        used += size
+    return {keys[index] for index in picked}
+
+def filter_search_results(output: Dict, sources: Optional[SourceStore] = None,
+                          step_byte_budget: int = 8000, dedup_threshold: float = 0.8) -> Dict:
+    """
+    Rank the answers and source texts of every plan step against the step and its queries, and
+    trim them to their most relevant sentences within step_byte_budget bytes per step.
+
+    Returns a new plan output with the trimmed answers. The texts in sources are trimmed in
+    place, a source cited by several steps keeps the sentences picked by any of them.
+    """
+    kept_source_sentences: Dict[str, Set[int]] = {}
+    filtered_plan = {}
+    for step, data in output["plan"].items():
+        search_results = data["search_results"]["queries"]
+        keys: List[PassageKey] = []
+        texts: List[str] = []
+        answer_sentences: Dict[str, List[str]] = {}
+        seen_sources = set()
+        for query, result in search_results.items():
+            if "error" in result:
+                continue
+            answer_sentences[query] = split_sentences(result.get("answer", ""))
+            for index, sentence in enumerate(answer_sentences[query]):
+                keys.append(("answer", query, index))
+                texts.append(sentence)
+            for source_id in result.get("sources", []):
+                source = sources.get(source_id) if sources is not None else None
+                if source is None or source_id in seen_sources:
+                    continue
+                seen_sources.add(source_id)
+                kept_source_sentences.setdefault(source_id, set())
+                for index, sentence in enumerate(split_sentences(source["text"])):
+                    keys.append(("source", source_id, index))
+                    texts.append(sentence)
+
+        query = " ".join([data.get("plan_step", "")] + list(data.get("search_queries", [])))
+        picked = select_passages(keys, texts, query, step_byte_budget, dedup_threshold) if keys else set()
+
+        filtered_results = {}
+        for query, result in search_results.items():
+            if query in answer_sentences:
+                answer = " ".join(sentence for index, sentence in enumerate(answer_sentences[query]) if ("answer", query, index) in picked)
+                result = {**result, "answer": answer}
+            filtered_results[query] = result
+        for kind, key, index in picked:
+            if kind == "source":
+                kept_source_sentences[key].add(index)
+        filtered_plan[step] = {**data, "search_results": {**data["search_results"], "queries": filtered_results}}
+
+    for source_id, indexes in kept_source_sentences.items():
+        sentences = split_sentences(sources.get(source_id)["text"])
+        sources.set_text(source_id, " ".join(sentence for index, sentence in enumerate(sentences) if index in indexes))
+    return {**output, "plan": filtered_plan}
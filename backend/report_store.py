@@ -0,0 +1,133 @@
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+INDEX_FILE = ".report_index.json"
+PARTIAL_SUFFIX = ".partial"
+
+class ReportStore:
+    """
+    Output directory of the reports.
+
+    Filenames come from a name format (see allocate) and optionally a date shard subdirectory
+    such as "%Y-%m-%d". The next {n} of a format is kept in a small index file per directory,
+    so allocating a name does not list the directory. A name is only handed out once it was
+    created with O_EXCL, which keeps concurrent runs from ever getting the same file even when
+    they race on the index. Reports are written to a .partial file and renamed into place.
+    """
+
+    def __init__(self, save_path: str, name_format: str = "final_report_{n}.md", shard_format: Optional[str] = None):
+        self.save_path = Path(save_path)
+        self.name_format = name_format
+        self.shard_format = shard_format
+
+    @classmethod
+    def from_config(cls, settings: Dict) -> "ReportStore":
+        return cls(
+            settings.get("report_save_path", "reports"),
+            settings.get("report_name_format", "final_report_{n}.md"),
+            settings.get("report_shard_format") or None
+        )
+
+    def _reserve(self, path: Path) -> bool:
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def _read_index(self, directory: Path) -> Dict[str, int]:
+        try:
+            with open(directory / INDEX_FILE, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_index(self, directory: Path, name: str, number: int):
+        # A concurrent run may overwrite this with a lower number, which only costs it a few O_EXCL retries
+        index = self._read_index(directory)
+        index[name] = max(number, index.get(name, 0))
+        temp_path = directory / f"{INDEX_FILE}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(index, file)
+        os.replace(temp_path, directory / INDEX_FILE)
+
+    def _scan_numbers(self, directory: Path, name: str) -> int:
+        """Highest {n} of the existing files, only needed the first time a directory and name are seen."""
+        pattern = re.compile('^' + re.escape(name).replace(re.escape('{n}'), r'(\d*)') + '$')
+        highest = 0
+        for entry in os.scandir(directory):
+            match = pattern.match(entry.name)
+            if match:
+                highest = max(highest, int(match.group(1)) if match.group(1) else 0)
+        return highest
+
+    def allocate(self) -> str:
+        """
+        Reserve a new report file and return its path. The name format supports:
+        - {date} : current date
+        - {time} : current time
+        - {n} : incremental number for collision avoidance
+        Without {n}, a number is only appended when the name is already taken.
+        """
+        now = datetime.now()
+        directory = self.save_path / now.strftime(self.shard_format) if self.shard_format else self.save_path
+        directory.mkdir(parents=True, exist_ok=True)
+
+        name = self.name_format.replace('{date}', now.strftime('%Y%m%d')).replace('{time}', now.strftime('%H%M%S'))
+        if '{n}' not in name:
+            if self._reserve(directory / name):
+                return str(directory / name)
+            stem, dot, extension = name.rpartition('.')
+            name = f"{stem}{{n}}.{extension}" if dot else f"{name}{{n}}"
+
+        index = self._read_index(directory)
+        number = (index[name] if name in index else self._scan_numbers(directory, name)) + 1
+        while not self._reserve(directory / name.replace('{n}', str(number))):
+            number += 1
+        self._write_index(directory, name, number)
+        return str(directory / name.replace('{n}', str(number)))
+
+    def write(self, report: str, filename: Optional[str] = None) -> str:
+        """Write a report atomically, to filename or a newly allocated file. Nothing is left behind when that fails."""
+        filename = filename or self.allocate()
+        partial_path = filename + PARTIAL_SUFFIX
+        try:
+            with open(partial_path, "w") as file:
+                file.write(report)
+            os.replace(partial_path, filename)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            if os.path.exists(filename) and os.path.getsize(filename) == 0:
+                os.remove(filename)
+            raise
+        return filename
+
+    def write_stream(self, chunks: Iterable[str], echo: bool = True, filename: Optional[str] = None) -> str:
+        """
+        Append report chunks to the .partial file as they arrive and rename it into place once
+        the stream is complete. When the stream fails the .partial file is kept.
+        """
+        filename = filename or self.allocate()
+        partial_path = filename + PARTIAL_SUFFIX
+        try:
+            with open(partial_path, "w") as file:
+                for chunk in chunks:
+                    file.write(chunk)
+                    file.flush()
+                    if echo:
+                        print(chunk, end="", flush=True)
+        except BaseException:
+            # Drop the empty reserved file, the partial report stays next to it
+            if os.path.exists(filename) and os.path.getsize(filename) == 0:
+                os.remove(filename)
+            raise
+        if echo:
+            print()
+        os.replace(partial_path, filename)
+        return filename
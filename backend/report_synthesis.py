@@ -0,0 +1,82 @@
+import concurrent.futures
+import contextvars
+import math
+from typing import Callable, Dict, List, Tuple
+
+# Rough average for English prose with the common BPE tokenizers, good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+DEFAULT_TOKEN_BUDGET = {
+    "max_input_tokens": 24000,
+    "chunk_tokens": 6000
+}
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token count estimate that does not need the model's tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def get_token_budget(token_budgets: Dict[str, Dict[str, int]], model: str) -> Dict[str, int]:
+    """Token budget for a model from config.json, falling back to the "default" entry."""
+    budget = dict(DEFAULT_TOKEN_BUDGET)
+    budget.update(token_budgets.get("default", {}))
+    budget.update(token_budgets.get(model, {}))
+    return budget
+
+def chunk_step_learnings(step_learnings: Dict[str, List[str]], chunk_tokens: int) -> List[Tuple[str, str]]:
+    """
+    Pack the learnings of each plan step into chunks of at most chunk_tokens.
+
+    Chunks never mix plan steps, and a single learning larger than the budget is truncated.
+    """
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    chunks = []
+    for plan_step, learnings in step_learnings.items():
+        current, current_chars = [], 0
+        for learning in learnings:
+            learning = learning[:max_chars]
+            if current and current_chars + len(learning) > max_chars:
+                chunks.append((plan_step, "\n\n".join(current)))
+                current, current_chars = [], 0
+            current.append(learning)
+            current_chars += len(learning) + 2
+        if current:
+            chunks.append((plan_step, "\n\n".join(current)))
+    return chunks
+
+def condense_learnings(
+    step_learnings: Dict[str, List[str]],
+    summarize: Callable[..., str],
+    max_input_tokens: int,
+    chunk_tokens: int,
+    max_workers: int = 5,
+    max_rounds: int = 3
+) -> str:
+    """
+    Map-reduce the learnings down to a size the report model can take in one prompt.
+
+    Learnings that already fit are returned unchanged. Otherwise every chunk is summarized in
+    parallel (map), and the condensed notes per plan step are fed to the final report (reduce).
+    If the notes are still too large, they are summarized again, up to max_rounds times.
+    """
+    for _ in range(max_rounds):
+        learnings = "\n\n".join("\n\n".join(items) for items in step_learnings.values())
+        if estimate_tokens(learnings) <= max_input_tokens:
+            return learnings
+
+        chunks = chunk_step_learnings(step_learnings, chunk_tokens)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Each call runs in a copy of the caller's context, so its span joins the current trace
+            futures = [
+                executor.submit(contextvars.copy_context().run, summarize, plan_step = plan_step, learnings = learnings)
+                for plan_step, learnings in chunks
+            ]
+            summaries = [future.result() for future in futures]
+
+        condensed: Dict[str, List[str]] = {}
+        for (plan_step, _), summary in zip(chunks, summaries):
+            condensed.setdefault(plan_step, []).append(f"### {plan_step}\n{summary}")
+        step_learnings = condensed
+
+    # Last resort, cut the notes to the budget rather than overflowing the context window
+    learnings = "\n\n".join("\n\n".join(items) for items in step_learnings.values())
+    return learnings[:max_input_tokens * CHARS_PER_TOKEN]
@@ -0,0 +1,284 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from rate_limit import RateLimiter
+from search_cache import SearchCache
+from search_transport import AsyncSearchTransport, SearchTransport, describe_http_error
+
+SEARCH_MODES = ("single", "race", "hedge")
+
+class SearchBackend:
+    """
+    A web search provider. Backends return {"answer": str, "citations": [...]} and raise on
+    transport or HTTP errors, so that the router can retry, race or hedge them.
+    """
+    name = "base"
+
+    def __init__(self, transport: SearchTransport, async_transport: AsyncSearchTransport):
+        self.transport = transport
+        self.async_transport = async_transport
+
+    def search(self, query: str) -> Dict:
+        raise NotImplementedError()
+
+    async def asearch(self, query: str) -> Dict:
+        raise NotImplementedError()
+
+class ExaBackend(SearchBackend):
+    """Exa answer API, returns an answer with its citations."""
+    name = "exa"
+
+    def __init__(self, transport: SearchTransport, async_transport: AsyncSearchTransport,
+                 api_key: str, url: str = "https://api.exa.ai/answer"):
+        super().__init__(transport, async_transport)
+        self.url = url
+        self.headers = {"Authorization": f"Bearer {api_key}", "Content-type": "application/json"}
+
+    def _payload(self, query: str) -> Dict:
+        return {"query": query, "text": True}
+
+    def search(self, query: str) -> Dict:
+        return self.transport.post_json(self.url, self._payload(query), headers=self.headers)
+
+    async def asearch(self, query: str) -> Dict:
+        return await self.async_transport.post_json(self.url, self._payload(query), headers=self.headers)
+
+class TavilyBackend(SearchBackend):
+    """Tavily search API with a generated answer, results are mapped to Exa style citations."""
+    name = "tavily"
+
+    def __init__(self, transport: SearchTransport, async_transport: AsyncSearchTransport,
+                 api_key: str, url: str = "https://api.tavily.com/search"):
+        super().__init__(transport, async_transport)
+        self.url = url
+        self.headers = {"Authorization": f"Bearer {api_key}", "Content-type": "application/json"}
+
+    def _payload(self, query: str) -> Dict:
+        return {"query": query, "include_answer": True, "search_depth": "basic"}
+
+    def _normalize(self, response: Dict) -> Dict:
+        return {
+            "answer": response.get("answer") or "",
+            "citations": [
+                {"title": result.get("title"), "url": result.get("url"), "text": result.get("content")}
+                for result in response.get("results", [])
+            ]
+        }
+
+    def search(self, query: str) -> Dict:
+        return self._normalize(self.transport.post_json(self.url, self._payload(query), headers=self.headers))
+
+    async def asearch(self, query: str) -> Dict:
+        return self._normalize(await self.async_transport.post_json(self.url, self._payload(query), headers=self.headers))
+
+SEARCH_BACKENDS = {
+    "exa": ExaBackend,
+    "tavily": TavilyBackend
+}
+
+class LatencyTracker:
+    """Sliding window of successful call latencies of one backend."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percentile: float, min_samples: int) -> Optional[float]:
+        """The given latency percentile, or None while there are fewer than min_samples samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[index]
+
+def _is_good(response: Dict) -> bool:
+    return bool(response.get("answer")) or bool(response.get("citations"))
+
+class SearchRouter:
+    """
+    Sends searches to one or more backends.
+
+    - single: only the first backend is used
+    - race: every backend gets the query, the first good answer wins and the others are dropped
+    - hedge: the first backend gets the query, and the next one is only fired when the first
+      has not answered within its observed latency percentile (hedge_percentile)
+
+    Results go through the search cache and every backend call through the shared rate limiter.
+    """
+
+    def __init__(self, backends: List[SearchBackend], mode: str = "single", cache: Optional[SearchCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None, hedge_percentile: float = 95,
+                 hedge_min_samples: int = 20, hedge_default_delay: float = 8.0, max_workers: int = 20):
+        if not backends:
+            raise ValueError("At least one search backend is required")
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode {mode}, expected one of {SEARCH_MODES}")
+        self.backends = backends if mode != "single" else backends[:1]
+        self.mode = mode
+        self.cache = cache
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_default_delay = hedge_default_delay
+        self.latency = {backend.name: LatencyTracker() for backend in self.backends}
+        self.wins = {backend.name: 0 for backend in self.backends}
+        self._wins_lock = threading.Lock()
+        # Only used by the blocking race and hedge modes
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) if len(self.backends) > 1 else None
+
+    def hedge_delay(self) -> float:
+        """How long the primary backend gets before the hedge request is fired."""
+        delay = self.latency[self.backends[0].name].percentile(self.hedge_percentile, self.hedge_min_samples)
+        return self.hedge_default_delay if delay is None else delay
+
+    def _record_win(self, backend: SearchBackend):
+        # Searches of different jobs finish on different threads
+        with self._wins_lock:
+            self.wins[backend.name] += 1
+
+    def _cache_key(self, query: str) -> str:
+        return self.cache.key("+".join(backend.name for backend in self.backends), query, {"text": True})
+
+    def _call(self, backend: SearchBackend, query: str) -> Dict:
+        start = time.perf_counter()
+        response = self.rate_limiter.call(backend.name, None, backend.search, query)
+        self.latency[backend.name].record(time.perf_counter() - start)
+        return response
+
+    async def _acall(self, backend: SearchBackend, query: str) -> Dict:
+        start = time.perf_counter()
+        response = await self.rate_limiter.acall(backend.name, None, backend.asearch, query)
+        self.latency[backend.name].record(time.perf_counter() - start)
+        return response
+
+    def _first_good(self, futures: Dict[Any, SearchBackend], pending: set) -> Dict:
+        """Wait on blocking futures until one returns a good answer, raising the last error if all of them fail."""
+        last_response, last_error = None, None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as error:
+                    last_error = error
+                    continue
+                if _is_good(response):
+                    self._record_win(futures[future])
+                    return response
+                last_response = response
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def _search(self, query: str) -> Dict:
+        if self.mode == "single":
+            response = self._call(self.backends[0], query)
+            self._record_win(self.backends[0])
+            return response
+        if self.mode == "race":
+            futures = {self._executor.submit(self._call, backend, query): backend for backend in self.backends}
+            return self._first_good(futures, set(futures))
+
+        # hedge: fire the backends one after the other, each once the previous ones took too long
+        futures = {}
+        pending = set()
+        for backend in self.backends:
+            future = self._executor.submit(self._call, backend, query)
+            futures[future] = backend
+            pending.add(future)
+            done, _ = concurrent.futures.wait(pending, timeout=self.hedge_delay(), return_when=concurrent.futures.FIRST_COMPLETED)
+            if any(not f.exception() and _is_good(f.result()) for f in done):
+                break
+        return self._first_good(futures, pending)
+
+    async def _afirst_good(self, tasks: Dict[asyncio.Task, SearchBackend], pending: set) -> Dict:
+        last_response, last_error = None, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    if _is_good(task.result()):
+                        self._record_win(tasks[task])
+                        return task.result()
+                    last_response = task.result()
+        finally:
+            # The losing requests are cancelled so they stop holding connections and rate limit slots
+            for task in pending:
+                task.cancel()
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    async def _asearch(self, query: str) -> Dict:
+        if self.mode == "single":
+            response = await self._acall(self.backends[0], query)
+            self._record_win(self.backends[0])
+            return response
+        if self.mode == "race":
+            tasks = {asyncio.ensure_future(self._acall(backend, query)): backend for backend in self.backends}
+            return await self._afirst_good(tasks, set(tasks))
+
+        tasks = {}
+        pending = set()
+        for backend in self.backends:
+            task = asyncio.ensure_future(self._acall(backend, query))
+            tasks[task] = backend
+            pending.add(task)
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay(), return_when=asyncio.FIRST_COMPLETED)
+            if any(t.exception() is None and _is_good(t.result()) for t in done):
+                break
+        return await self._afirst_good(tasks, set(tasks))
+
+    def search(self, query: str, bypass_cache: bool = False) -> Dict:
+        """Search the web, returning {"error": ...} when every backend failed."""
+        cache_key = self._cache_key(query) if self.cache is not None else None
+        if cache_key is not None:
+            cached = self.cache.lookup(cache_key, bypass=bypass_cache)
+            if cached is not None:
+                return cached
+        try:
+            response = self._search(query)
+        except Exception as error:
+            return describe_http_error(error)
+        if cache_key is not None:
+            self.cache.store(cache_key, response)
+        return response
+
+    async def asearch(self, query: str, bypass_cache: bool = False) -> Dict:
+        """Async variant of search, the cache's disk tier is read and written on a worker thread."""
+        cache_key = self._cache_key(query) if self.cache is not None else None
+        if cache_key is not None:
+            cached = await asyncio.to_thread(self.cache.lookup, cache_key, bypass=bypass_cache)
+            if cached is not None:
+                return cached
+        try:
+            response = await self._asearch(query)
+        except Exception as error:
+            return describe_http_error(error)
+        if cache_key is not None:
+            await asyncio.to_thread(self.cache.store, cache_key, response)
+        return response
+
+    def _wins_snapshot(self) -> Dict[str, int]:
+        with self._wins_lock:
+            return dict(self.wins)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "wins": self._wins_snapshot(),
+            "p50_seconds": {name: tracker.percentile(50, 1) for name, tracker in self.latency.items()},
+            "hedge_delay_seconds": self.hedge_delay() if self.mode == "hedge" else None
+        }
@@ -0,0 +1,39 @@
+import re
+from typing import Any, Dict, Optional
+
+from cache import TieredCache, make_cache_key
+
+def normalize_query(query: str) -> str:
+    """Lowercase the query and collapse whitespace so trivially different queries share an entry."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+class SearchCache:
+    """Cache of web search responses keyed on the normalized query plus the search parameters."""
+
+    def __init__(self, cache: TieredCache, enabled: bool = True):
+        self.cache = cache
+        self.enabled = enabled
+
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any], base_dir: str) -> "SearchCache":
+        cache = TieredCache.from_config(cache_config, base_dir, ".cache/search_cache.sqlite3")
+        return cls(cache, enabled=cache_config.get("enabled", True))
+
+    def key(self, provider: str, query: str, params: Dict[str, Any]) -> str:
+        return make_cache_key(provider, normalize_query(query), params)
+
+    def lookup(self, key: str, bypass: bool = False) -> Optional[Dict]:
+        """Return the cached response, or None on a miss or when the cache is bypassed."""
+        if not self.enabled or bypass:
+            self.cache.record_bypass()
+            return None
+        value = self.cache.get(key)
+        return value if isinstance(value, dict) else None
+
+    def store(self, key: str, response: Dict):
+        # Errors are never cached, the next run should retry them
+        if self.enabled and "error" not in response:
+            self.cache.set(key, response)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
@@ -0,0 +1,75 @@
+import asyncio
+import weakref
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 20
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 60.0
+
+def describe_http_error(error: Exception) -> Dict:
+    """Turn a transport exception into the {"error": ...} payload used by the search wrappers."""
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None)
+    if status_code is None:
+        return {"error": str(error)}
+    return {"error": f"HTTP {status_code}: {response.text[:500]}", "status_code": status_code}
+
+class SearchTransport:
+    """Blocking HTTP transport that keeps a pool of keep-alive connections across searches."""
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        # urllib3 connection pools are thread safe, so one session is shared by all search threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def post_json(self, url: str, payload: Dict, headers: Optional[Dict] = None) -> Dict:
+        """POST a JSON payload and return the decoded JSON response, raising on HTTP errors."""
+        response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+class AsyncSearchTransport:
+    """Async HTTP transport backed by httpx, with one pooled client per event loop."""
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        # httpx clients are bound to the loop that created them
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _get_client(self):
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def post_json(self, url: str, payload: Dict, headers: Optional[Dict] = None) -> Dict:
+        """POST a JSON payload and return the decoded JSON response, raising on HTTP errors."""
+        response = await self._get_client().post(url, json=payload, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        """Close the client owned by the running event loop, if any."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
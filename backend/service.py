@@ -0,0 +1,325 @@
+"""
+Long-running research service.
+
+Keeps one process up, so the provider clients, the connection pools and the in-memory caches
+stay warm from one job to the next instead of being rebuilt by every run. Submitted jobs wait
+in a bounded queue for a pool of workers, and the plans of all running jobs are executed
+together on one shared event loop, competing for the same search and LLM call limits.
+
+Endpoints:
+
+    POST /jobs               {"query": "...", "followup_answers": ["Europe only"]} or {"query": "...", "skip_followups": true}
+                             -> 202 {"id": ..., "status": "queued"}, 503 when the queue is full
+    GET  /jobs               every job the service knows about
+    GET  /jobs/<id>          status, stage timings, report path and error of a job
+    GET  /jobs/<id>/report   the report as markdown, streamed while it is being generated, the final
+                             X-Job-Status / X-Job-Error trailers tell a finished report from a failed one
+    GET  /stats              queue, cache, rate limiter and search backend stats
+
+Usage: python service.py --host 127.0.0.1 --port 8080 --workers 8
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+import app
+from checkpoint import RunCheckpoint
+from plan_executor import PlanScheduler
+
+class ReportBuffer:
+    """Report text of a running job, readers block until more of it arrives."""
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def append(self, chunk: str):
+        with self._condition:
+            self._chunks.append(chunk)
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def read(self) -> Iterator[str]:
+        """Every chunk from the start, then the new ones as they arrive, until the report is done."""
+        index = 0
+        while True:
+            with self._condition:
+                while index >= len(self._chunks) and not self._closed:
+                    self._condition.wait()
+                chunks = self._chunks[index:]
+            if not chunks:
+                return
+            index += len(chunks)
+            yield from chunks
+
+class Job:
+    def __init__(self, job_id: str, request: Dict[str, Any]):
+        self.id = job_id
+        self.run_id = f"service_{job_id}"
+        self.query = request["query"]
+        self.followup_answers = request.get("followup_answers")
+        # Nobody is there to answer the follow-up questions unless the answers come with the job
+        self.skip_followups = request.get("skip_followups", "followup_answers" not in request)
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.report: Optional[str] = None
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self.trace_summary = None
+        self.report_buffer: Optional[ReportBuffer] = ReportBuffer()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "run_id": self.run_id,
+            "query": self.query,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "report": self.report,
+            "error": self.error,
+            "timings": self.timings,
+            "trace_summary": self.trace_summary
+        }
+
+class ResearchService:
+    """Job queue and worker pool of the service, the clients, pools and caches of the app module are shared by every job."""
+
+    def __init__(self, workers: int = 8, max_queued_jobs: int = 64, max_finished_jobs: int = 1000, max_followup_answers: int = 5):
+        settings = app.config["settings"]
+        self.queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max_queued_jobs)
+        self.max_finished_jobs = max_finished_jobs
+        self.max_followup_answers = max_followup_answers
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.runs_path = os.path.join(os.path.dirname(os.path.abspath(app.__file__)), settings.get("runs_path", "runs"))
+        self.scheduler = PlanScheduler(
+            max_concurrent_searches = settings.get("max_concurrent_searches", 8),
+            max_concurrent_llm_calls = settings.get("max_concurrent_llm_calls", 5),
+            max_worker_threads = settings.get("plan_worker_threads")
+        )
+        self._workers = [threading.Thread(target=self._work, name=f"research-worker-{i}", daemon=True) for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def warm_up(self):
+        """Create the provider clients up front, so the first job does not pay for the SDK imports."""
+        for operation_config in (app.followup_config, app.research_plan_config, app.query_generation_config,
+                                 app.report_generation_config, app.learnings_summary_config):
+            try:
+                app.provider_registry.get_client(operation_config["service"])
+            except Exception as exc:
+                print(f"Could not create the {operation_config['service']} client: {exc}")
+
+    def submit(self, request: Dict[str, Any]) -> Job:
+        """Queue a job, raising queue.Full when the queue is at capacity."""
+        if not isinstance(request.get("query"), str) or not request["query"].strip():
+            raise ValueError("A job needs a non-empty query")
+        answers = request.get("followup_answers")
+        # Every answer is one more follow-up round of LLM calls
+        if answers is not None and (not isinstance(answers, list) or not all(isinstance(answer, str) for answer in answers)):
+            raise ValueError("followup_answers must be a list of strings")
+        if answers is not None and len(answers) > self.max_followup_answers:
+            raise ValueError(f"A job takes at most {self.max_followup_answers} followup_answers")
+        if not isinstance(request.get("skip_followups", False), bool):
+            raise ValueError("skip_followups must be true or false")
+        job = Job(uuid.uuid4().hex[:12], request)
+        with self._lock:
+            self.queue.put_nowait(job)
+            self.jobs[job.id] = job
+            self._evict_finished()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(self.jobs.values())
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            checkpoint = RunCheckpoint(os.path.join(self.runs_path, job.run_id))
+            job.report = app.run_research(
+                checkpoint,
+                initial_query = job.query,
+                followup_answers = job.followup_answers,
+                skip_followups = job.skip_followups,
+                verbose = False,
+                timings = job.timings,
+                scheduler = self.scheduler,
+                on_report_chunk = job.report_buffer.append
+            )
+            job.status = "completed"
+        except Exception as exc:
+            job.status = "failed"
+            job.error = f"{type(exc).__name__}: {exc}"
+            print(f"Job {job.id} failed:\n{traceback.format_exc()}")
+        job.report_buffer.close()
+        # From now on the report is served from its file
+        job.report_buffer = None
+        job.trace_summary = app.tracer.summary(job.run_id)
+        app.tracer.discard(job.run_id)
+        job.finished_at = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        jobs = self.list()
+        return {
+            "queued": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "workers": len(self._workers),
+            "jobs": {status: sum(job.status == status for job in jobs) for status in ("queued", "running", "completed", "failed")},
+            "search_cache": app.search_cache.stats(),
+            "llm_cache": app.llm_cache.stats(),
+            "rate_limits": app.rate_limiter.stats(),
+            "search_backends": app.search_router.stats()
+        }
+
+    def close(self):
+        for _ in self._workers:
+            self.queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self.scheduler.call(app.async_search_transport.aclose())
+        self.scheduler.close()
+
+def make_handler(service: ResearchService):
+    class ServiceHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, payload: Any, status: int = 200, headers: Optional[Dict[str, str]] = None):
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _end_chunks(self, trailers: Dict[str, str]):
+            lines = "".join(f"{name}: {value}\r\n" for name, value in trailers.items())
+            self.wfile.write(b"0\r\n" + lines.encode("utf-8") + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/jobs":
+                self._send_json({"error": f"Unknown path {self.path}"}, status=404)
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                job = service.submit(json.loads(self.rfile.read(length) or b"{}"))
+            except (ValueError, AttributeError) as exc:
+                self._send_json({"error": str(exc)}, status=400)
+                return
+            except queue.Full:
+                self._send_json({"error": "The job queue is full, try again later"}, status=503, headers={"Retry-After": "30"})
+                return
+            self._send_json({"id": job.id, "status": job.status}, status=202, headers={"Location": f"/jobs/{job.id}"})
+
+        def do_GET(self):
+            parts = [part for part in self.path.split("?")[0].split("/") if part]
+            if parts == ["jobs"]:
+                self._send_json([job.to_dict() for job in service.list()])
+            elif parts == ["stats"]:
+                self._send_json(service.stats())
+            elif len(parts) in (2, 3) and parts[0] == "jobs":
+                job = service.get(parts[1])
+                if job is None:
+                    self._send_json({"error": f"Unknown job {parts[1]}"}, status=404)
+                elif len(parts) == 2:
+                    self._send_json(job.to_dict())
+                elif parts[2] == "report":
+                    self._stream_report(job)
+                else:
+                    self._send_json({"error": f"Unknown path {self.path}"}, status=404)
+            else:
+                self._send_json({"error": f"Unknown path {self.path}"}, status=404)
+
+        def _stream_report(self, job: Job):
+            buffer = job.report_buffer
+            if buffer is None and job.report is None:
+                self._send_json({"error": f"Job {job.id} has no report", "status": job.status}, status=409)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/markdown; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            # The status line is long gone when a job fails halfway through its report
+            self.send_header("Trailer", "X-Job-Status, X-Job-Error")
+            self.end_headers()
+            try:
+                if buffer is not None:
+                    for chunk in buffer.read():
+                        self._send_chunk(chunk.encode("utf-8"))
+                else:
+                    with open(job.report, "rb") as file:
+                        for data in iter(lambda: file.read(64 * 1024), b""):
+                            self._send_chunk(data)
+                trailers = {"X-Job-Status": job.status}
+                if job.error is not None:
+                    trailers["X-Job-Error"] = " ".join(job.error.split())
+                self._end_chunks(trailers)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away, the job itself keeps running
+                pass
+
+    return ServiceHandler
+
+if __name__ == "__main__":
+    settings = app.config["settings"]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings.get("service_host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=settings.get("service_port", 8080))
+    parser.add_argument("--workers", type=int, default=settings.get("max_concurrent_jobs", 8), help="number of jobs to run at the same time")
+    parser.add_argument("--max-queued-jobs", type=int, default=settings.get("service_max_queued_jobs", 64),
+                        help="jobs waiting for a worker before new submissions are rejected")
+    args = parser.parse_args()
+
+    service = ResearchService(args.workers, args.max_queued_jobs, settings.get("service_max_finished_jobs", 1000),
+                              settings.get("service_max_followup_answers", 5))
+    service.warm_up()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    server.daemon_threads = True
+    print(f"Research service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
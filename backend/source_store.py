@@ -0,0 +1,155 @@
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from report_synthesis import CHARS_PER_TOKEN
+
+# Query parameters that only track where a click came from. Only the utm_ family is matched by
+# prefix, "ref" would otherwise also drop meaningful ones like "reference" or "refresh"
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src"})
+TRACKING_PREFIX = "utm_"
+SOURCE_ID = re.compile(r"\[(S\d+)\](?!\()")
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL so that the same page found by different queries is stored once."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIX)
+    ))
+    return urlunsplit((parts.scheme.lower() or "https", host, parts.path.rstrip("/") or "/", query, ""))
+
+class SourceStore:
+    """
+    Run-level store of the citations returned by the searches.
+
+    Every citation is interned once by normalized URL under a short id (S1, S2, ...). Search
+    results and learnings only carry the ids, the text of a source is kept once here. Sources
+    past max_sources are dropped, the first ones found are kept.
+    """
+
+    def __init__(self, max_sources: int = 500, max_text_chars: int = 1000,
+                 on_add: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.max_sources = max_sources
+        self.max_text_chars = max_text_chars
+        self.on_add = on_add
+        self._sources: Dict[str, Dict[str, Any]] = {}
+        self._ids_by_url: Dict[str, str] = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def load(self, sources: Iterable[Dict[str, Any]]):
+        """Restore sources recorded by an earlier run, keeping their ids."""
+        with self._lock:
+            for source in sources:
+                self._sources[source["id"]] = source
+                self._ids_by_url[normalize_url(source["url"])] = source["id"]
+
+    def add(self, citation: Dict[str, Any]) -> Optional[str]:
+        """Intern a citation, returning its id, or None when it has no URL or the store is full."""
+        url = citation.get("url") or citation.get("id")
+        if not url:
+            return None
+        key = normalize_url(url)
+        with self._lock:
+            source_id = self._ids_by_url.get(key)
+            if source_id is not None:
+                return source_id
+            if len(self._sources) >= self.max_sources:
+                self.dropped += 1
+                return None
+            source_id = f"S{len(self._sources) + 1}"
+            source = {
+                "id": source_id,
+                "url": url,
+                "title": citation.get("title") or url,
+                "text": (citation.get("text") or "")[:self.max_text_chars]
+            }
+            self._sources[source_id] = source
+            self._ids_by_url[key] = source_id
+        if self.on_add is not None:
+            self.on_add(source)
+        return source_id
+
+    def merge(self, other: "SourceStore") -> Dict[str, str]:
+        """Intern every source of another store, returning the id each of its ids has here."""
+        new_ids = {}
+        for source_id, source in list(other._sources.items()):
+            new_id = self.add(source)
+            if new_id is not None:
+                new_ids[source_id] = new_id
+        return new_ids
+
+    def get(self, source_id: str) -> Optional[Dict[str, Any]]:
+        return self._sources.get(source_id)
+
+    def set_text(self, source_id: str, text: str):
+        """Replace the text of a source, e.g. with its most relevant sentences."""
+        with self._lock:
+            self._sources[source_id] = {**self._sources[source_id], "text": text}
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def format_sources(self, source_ids: Iterable[str], max_tokens: int) -> str:
+        """
+        The sources block of the report prompt, each source once. Texts are included while
+        they fit in max_tokens, the next sources are listed with their title and URL only, and
+        sources are left out once even that no longer fits.
+        """
+        max_chars = max_tokens * CHARS_PER_TOKEN
+        lines, used = [], 0
+        for source_id in dict.fromkeys(source_ids):
+            source = self._sources.get(source_id)
+            if source is None:
+                continue
+            line = f"[{source_id}] {source['title']} ({source['url']})"
+            if used + len(line) + 2 > max_chars:
+                break
+            if source["text"] and used + len(line) + len(source["text"]) + 2 <= max_chars:
+                line += f"\n{source['text']}"
+            used += len(line) + 2
+            lines.append(line)
+        return "\n\n".join(lines)
+
+    def _link(self, match: re.Match) -> str:
+        source = self._sources.get(match.group(1))
+        return f"[{match.group(1)}]({source['url']})" if source is not None else match.group(0)
+
+    def expand(self, report: str) -> str:
+        """Turn the [S1] ids of a report into links and list the cited sources at the end."""
+        cited = list(dict.fromkeys(SOURCE_ID.findall(report)))
+        return SOURCE_ID.sub(self._link, report) + self.references(cited)
+
+    def expand_stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """expand for a streamed report, an id split across two chunks is held back until it is complete."""
+        cited: List[str] = []
+        pending = ""
+        for chunk in chunks:
+            text = pending + chunk
+            # Hold back a "[S12" that may continue in the next chunk
+            cut = text.rfind("[")
+            if cut != -1 and "]" not in text[cut:] and len(text) - cut <= 8:
+                text, pending = text[:cut], text[cut:]
+            else:
+                pending = ""
+            cited.extend(SOURCE_ID.findall(text))
+            if text:
+                yield SOURCE_ID.sub(self._link, text)
+        if pending:
+            yield pending
+        yield self.references(list(dict.fromkeys(cited)))
+
+    def references(self, source_ids: List[str]) -> str:
+        lines = [
+            f"- [{source_id}] [{self._sources[source_id]['title']}]({self._sources[source_id]['url']})"
+            for source_id in source_ids if source_id in self._sources
+        ]
+        return "\n\n## Sources\n\n" + "\n".join(lines) + "\n" if lines else ""
+
+    def stats(self) -> Dict[str, int]:
+        return {"sources": len(self._sources), "dropped": self.dropped}
@@ -0,0 +1,104 @@
+import contextvars
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Optional
+
+from query_dedup import query_tokens
+
+# Words that carry nothing of their own ("yes", "sounds good", "anything is fine"). Negations are
+# not in here, "not China" or "no forecasts" narrow the research as much as any other answer.
+FILLER_WORDS = frozenset({
+    "yes", "yeah", "yep", "ok", "okay", "sure", "fine", "good", "great", "thanks", "thank", "you",
+    "please", "just", "all", "any", "anything", "whatever", "skip", "i", "me", "my", "that", "this",
+    "sounds", "looks", "go", "ahead", "everything", "both", "either", "general", "generally",
+    # How the follow-up questions are phrased
+    "should", "would", "could", "do", "does", "want", "like", "research", "cover", "focus", "include"
+})
+
+# Work run in the background: (context snapshot, cancelled flag) -> result
+SpeculativeWork = Callable[[str, threading.Event], Dict[str, Any]]
+
+def new_terms(context: str, question: str, answer: str) -> FrozenSet[str]:
+    """
+    Content words of a follow-up turn that the context does not already contain. The question
+    counts too, a "yes" to "Should the research focus on Europe?" narrows it to Europe.
+    """
+    return query_tokens(f"{question} {answer}") - query_tokens(context) - FILLER_WORDS
+
+class Speculation:
+    """Result of some work on a snapshot of the context, computed in a background thread."""
+
+    def __init__(self, context: str, work: SpeculativeWork):
+        self.context = context
+        self.cancelled = threading.Event()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        # The thread inherits the context variables, so its spans belong to the current trace
+        run_context = contextvars.copy_context()
+        self._thread = threading.Thread(target=run_context.run, args=(self._run, work), daemon=True)
+        self._thread.start()
+
+    def _run(self, work: SpeculativeWork):
+        try:
+            self._result = work(self.context, self.cancelled)
+        except Exception as error:
+            self._error = error
+        finally:
+            self._done.set()
+
+    def cancel(self):
+        """Ask the work to stop, calls already in flight finish and their result is dropped."""
+        self.cancelled.set()
+
+    def result(self) -> Dict[str, Any]:
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+class SpeculativePlanner:
+    """
+    Runs research planning while the user answers follow-up questions.
+
+    A speculation starts from the context as it is before a follow-up question. It is kept as
+    long as every question and its answer add at most max_new_terms content words to its
+    context snapshot, otherwise it is cancelled and the next one starts from the updated
+    context. With the default of 0, only turns that stay within the context keep it, a one
+    word answer such as "Europe" already changes the research.
+    """
+
+    def __init__(self, work: SpeculativeWork, max_new_terms: int = 0):
+        self.work = work
+        self.max_new_terms = max_new_terms
+        self.speculation: Optional[Speculation] = None
+        self.kept = 0
+        self.cancelled = 0
+
+    def before_followup(self, context: str):
+        if self.speculation is None:
+            self.speculation = Speculation(context, self.work)
+
+    def after_answer(self, question: str, answer: str) -> bool:
+        """Keep or cancel the running speculation given the question and the user's answer, returns whether it was kept."""
+        if self.speculation is None:
+            return False
+        if len(new_terms(self.speculation.context, question, answer)) <= self.max_new_terms:
+            self.kept += 1
+            return True
+        self.speculation.cancel()
+        self.speculation = None
+        self.cancelled += 1
+        return False
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """Result of the speculation that survived every answer, None if there is none or it failed."""
+        if self.speculation is None:
+            return None
+        try:
+            return self.speculation.result()
+        except Exception as error:
+            print(f"Speculative planning failed, planning again: {error}")
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        return {"kept": self.kept, "cancelled": self.cancelled}
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from checkpoint import SEARCHES_FILE, RunCheckpoint
+
+def test_append_after_a_torn_line_keeps_the_new_record(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path / "run"))
+    checkpoint.record_search("first", {"answer": "one"})
+    # A crash in the middle of the second record
+    with open(os.path.join(checkpoint.run_dir, SEARCHES_FILE), "a", encoding="utf-8") as file:
+        file.write('{"query": "second", "resu')
+
+    resumed = RunCheckpoint.resume(str(tmp_path), "run")
+    resumed.record_search("third", {"answer": "three"})
+    assert resumed.completed_searches() == {"first": {"answer": "one"}, "third": {"answer": "three"}}
+
+def test_torn_first_line_is_dropped(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path / "run"))
+    with open(os.path.join(checkpoint.run_dir, SEARCHES_FILE), "w", encoding="utf-8") as file:
+        file.write('{"query": "fir' + "x" * 10000)
+    checkpoint.record_search("second", {"answer": "two"})
+    assert checkpoint.completed_searches() == {"second": {"answer": "two"}}
@@ -0,0 +1,21 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_extraction import parse_json
+from llm_providers.schemas import ResearchPlan
+
+def test_truncated_key_after_its_colon_is_dropped():
+    plan = parse_json('{"plan": {"step 1": "x", "step 2":')
+    assert plan == {"plan": {"step 1": "x"}}
+    ResearchPlan.model_validate(plan)
+
+def test_truncated_key_without_its_colon_is_dropped():
+    assert parse_json('{"plan": {"step 1": "x", "step 2"') == {"plan": {"step 1": "x"}}
+
+def test_truncated_string_value_is_closed():
+    assert parse_json('{"plan": {"step 1": "x", "step 2": "Resea') == {"plan": {"step 1": "x", "step 2": "Resea"}}
+
+def test_trailing_commas_are_dropped():
+    assert parse_json('{"search_queries": ["a", "b",],}') == {"search_queries": ["a", "b"]}
@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plan_executor import PlanScheduler
+
+def test_blocking_callbacks_run_off_the_shared_loop():
+    scheduler = PlanScheduler()
+    callback_threads = []
+
+    def record(*args):
+        callback_threads.append(threading.current_thread())
+        return args[0]
+
+    async def generate_queries(step, description):
+        return {step: {"search_queries": [f"{description} query"]}}
+
+    async def search(query):
+        return {"answer": query, "citations": []}
+
+    try:
+        output = scheduler.run(
+            plan_steps = {"step 1": "one", "step 2": "two"},
+            generate_queries = generate_queries,
+            search = search,
+            format_result = record,
+            on_search_complete = record,
+            on_step_complete = record
+        )
+    finally:
+        scheduler.close()
+    assert output["plan"]["step 2"]["search_results"]["queries"] == {"two query": {"answer": "two query", "citations": []}}
+    assert len(callback_threads) == 6
+    assert scheduler._thread not in callback_threads
+    assert all(thread.name.startswith("plan-worker") for thread in callback_threads)
+
+def test_slow_result_handling_does_not_hold_the_search_slot():
+    scheduler = PlanScheduler(max_concurrent_searches = 1)
+    searched = threading.Event()
+    both_searched = threading.Event()
+    searches = []
+
+    async def generate_queries(step, description):
+        return {step: {"search_queries": [description]}}
+
+    async def search(query):
+        searches.append(query)
+        if len(searches) == 2:
+            both_searched.set()
+        return {"answer": query, "citations": []}
+
+    def format_result(response):
+        # The first result is held until the second search has gone through the single slot
+        if not searched.is_set():
+            searched.set()
+            assert both_searched.wait(5)
+        return response
+
+    try:
+        output = scheduler.run(
+            plan_steps = {"step 1": "one", "step 2": "two"},
+            generate_queries = generate_queries,
+            search = search,
+            format_result = format_result
+        )
+    finally:
+        scheduler.close()
+    assert sorted(searches) == ["one", "two"]
+    assert "error" not in output["plan"]["step 1"]["search_results"]["queries"]["one"]
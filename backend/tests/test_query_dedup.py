@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_dedup import QueryDeduplicator
+
+def test_reworded_queries_are_merged():
+    deduplicator = QueryDeduplicator()
+    assert deduplicator.assign("EV market size 2025") == "EV market size 2025"
+    assert deduplicator.assign("market size of the EV market 2025") == "EV market size 2025"
+    assert deduplicator.cluster_count == 1
+
+def test_queries_differing_in_their_key_entity_stay_apart():
+    deduplicator = QueryDeduplicator()
+    europe = "electric vehicle battery supply chain market share growth forecast 2024 2030 Europe"
+    china = "electric vehicle battery supply chain market share growth forecast 2024 2030 China"
+    assert deduplicator.assign(europe) == europe
+    assert deduplicator.assign(china) == china
+    assert deduplicator.cluster_count == 2
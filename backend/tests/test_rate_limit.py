@@ -0,0 +1,85 @@
+import os
+import sys
+
+import httpx
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import RateLimiter, is_retryable
+
+class FlakyError(Exception):
+    status_code = 503
+
+def fast_limiter(**limits) -> RateLimiter:
+    return RateLimiter(limits, {"max_attempts": 3, "base_delay": 0.0, "max_delay": 0.0})
+
+def test_call_passes_model_through_to_the_function():
+    limiter = fast_limiter()
+    assert limiter.call("openai", "gpt-4o", lambda model: model, model = "gpt-4o") == "gpt-4o"
+
+def test_stream_retries_until_the_first_chunk():
+    limiter = fast_limiter()
+    attempts = []
+
+    def open_stream():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise FlakyError()
+        yield "a"
+        yield "b"
+
+    assert list(limiter.stream("openai", None, open_stream)) == ["a", "b"]
+    assert len(attempts) == 3
+    assert limiter.stats()["openai"]["retries"] == 2
+
+def test_stream_holds_the_concurrency_slot_until_closed():
+    limiter = fast_limiter(openai = {"max_concurrency": 1})
+    concurrency = limiter.limits["openai"].concurrency
+    stream = limiter.stream("openai", None, lambda: iter(["a", "b"]))
+    assert next(stream) == "a"
+    assert not concurrency.try_acquire()
+    stream.close()
+    assert concurrency.try_acquire()
+
+def test_stream_does_not_retry_non_retryable_errors():
+    limiter = fast_limiter()
+
+    def open_stream():
+        raise ValueError("bad request")
+        yield
+
+    with pytest.raises(ValueError):
+        list(limiter.stream("openai", None, open_stream))
+    assert limiter.stats()["openai"]["calls"] == 1
+
+def http_error(status_code: int) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(response = response)
+
+@pytest.mark.parametrize("error", [
+    httpx.ConnectError("connection refused"),
+    httpx.RemoteProtocolError("server disconnected"),
+    httpx.ReadError("connection reset"),
+    httpx.ReadTimeout("timed out"),
+    requests.exceptions.ChunkedEncodingError("connection broken"),
+    requests.exceptions.ConnectionError("connection aborted"),
+    http_error(429),
+    http_error(500),
+    http_error(529),
+])
+def test_transient_errors_are_retryable(error):
+    assert is_retryable(error)
+
+@pytest.mark.parametrize("error", [
+    http_error(400),
+    http_error(401),
+    http_error(404),
+    requests.exceptions.MissingSchema("no scheme"),
+    httpx.UnsupportedProtocol("ftp"),
+    ValueError("bad request"),
+])
+def test_client_errors_are_not_retryable(error):
+    assert not is_retryable(error)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_store import ReportStore
+
+def test_failed_write_leaves_no_partial_or_reserved_file(tmp_path):
+    store = ReportStore(str(tmp_path))
+    with pytest.raises(TypeError):
+        store.write(None)
+    assert os.listdir(tmp_path) == [".report_index.json"]
+
+def test_reports_are_not_sharded_by_default(tmp_path):
+    store = ReportStore.from_config({"report_save_path": str(tmp_path), "report_shard_format": None})
+    first, second = store.write("first"), store.write("second")
+    assert [os.path.dirname(first), os.path.dirname(second)] == [str(tmp_path)] * 2
+    assert os.path.basename(second) == "final_report_2.md"
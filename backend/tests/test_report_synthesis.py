@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_synthesis import condense_learnings
+from tracing import Tracer
+
+def test_summaries_are_traced_under_the_current_run():
+    tracer = Tracer()
+
+    def summarize(plan_step: str, learnings: str) -> str:
+        with tracer.span("summarize_learnings", step = plan_step):
+            return "short"
+
+    step_learnings = {f"step {i}": ["x" * 400] * 4 for i in range(3)}
+    with tracer.trace("run_1"):
+        condense_learnings(step_learnings, summarize, max_input_tokens = 200, chunk_tokens = 150, max_workers = 3)
+    assert len(tracer.spans("run_1")) > 0
+    assert tracer.spans(None) == []
+
+def test_budget_of_zero_yields_no_learnings():
+    assert condense_learnings({"step 1": ["x" * 400]}, lambda plan_step, learnings: "y" * 400, 0, 100, max_rounds = 1) == ""
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_providers import response_cache
+from llm_providers.registry import LazyFunction, ProviderRegistry
+from llm_providers.response_cache import LLMResponseCache
+
+def key(service: str = "openai", module: str = "llm_providers.openai_impl") -> str:
+    function = LazyFunction(module, "generate_report")
+    return LLMResponseCache(None).key(function, service, "gpt-4o", "report_generation", {"prompt": "ev", "learnings": "..."})
+
+def test_key_changes_with_the_implementation_source(monkeypatch):
+    before = key()
+    monkeypatch.setattr(response_cache, "module_fingerprint", lambda module: "edited system message")
+    assert key() != before
+
+def test_key_tells_implementations_and_endpoints_apart(monkeypatch):
+    assert key(module="llm_providers.openai_impl") != key(module="llm_providers.google_genai_impl")
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://localhost:11434/v1")
+    registry = ProviderRegistry()
+    assert registry.provider_id("openai") == "openai@http://localhost:11434/v1"
+    assert key(service=registry.provider_id("openai")) != key()
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_backends import SearchBackend, SearchRouter
+
+class FakeBackend(SearchBackend):
+    """Answers after a fixed delay and records whether its async search was cancelled."""
+
+    def __init__(self, name: str, delay: float):
+        super().__init__(None, None)
+        self.name = name
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = False
+
+    def search(self, query: str):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"answer": f"{self.name}: {query}", "citations": []}
+
+    async def asearch(self, query: str):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {"answer": f"{self.name}: {query}", "citations": []}
+
+def router(mode: str, *backends: FakeBackend, **kwargs) -> SearchRouter:
+    return SearchRouter(list(backends), mode, hedge_min_samples = 1000, **kwargs)
+
+def test_race_returns_the_fastest_answer_and_cancels_the_loser():
+    fast, slow = FakeBackend("fast", 0.01), FakeBackend("slow", 5)
+    search_router = router("race", slow, fast)
+
+    async def search():
+        response = await search_router.asearch("ev sales")
+        await asyncio.sleep(0)  # let the cancellation reach the loser
+        return response
+
+    start = time.perf_counter()
+    assert asyncio.run(search())["answer"] == "fast: ev sales"
+    assert time.perf_counter() - start < 1
+    assert slow.cancelled
+    assert search_router.stats()["wins"] == {"slow": 0, "fast": 1}
+
+def test_hedge_fires_the_second_backend_after_the_hedge_delay():
+    primary, secondary = FakeBackend("primary", 5), FakeBackend("secondary", 0.01)
+    search_router = router("hedge", primary, secondary, hedge_default_delay = 0.05)
+
+    async def search():
+        response = await search_router.asearch("ev sales")
+        await asyncio.sleep(0)
+        return response
+
+    start = time.perf_counter()
+    assert asyncio.run(search())["answer"] == "secondary: ev sales"
+    assert 0.05 <= time.perf_counter() - start < 1
+    assert primary.cancelled
+    assert search_router.stats()["wins"] == {"primary": 0, "secondary": 1}
+
+def test_hedge_does_not_fire_when_the_primary_answers_in_time():
+    primary, secondary = FakeBackend("primary", 0.01), FakeBackend("secondary", 0.01)
+    search_router = router("hedge", primary, secondary, hedge_default_delay = 1)
+    assert asyncio.run(search_router.asearch("ev sales"))["answer"] == "primary: ev sales"
+    assert search_router.search("ev sales")["answer"] == "primary: ev sales"
+    assert secondary.calls == 0
+
+def test_blocking_hedge_and_race():
+    primary, secondary = FakeBackend("primary", 0.5), FakeBackend("secondary", 0.01)
+    start = time.perf_counter()
+    assert router("hedge", primary, secondary, hedge_default_delay = 0.05).search("q")["answer"] == "secondary: q"
+    assert time.perf_counter() - start < 0.4
+    assert router("race", primary, secondary).search("q")["answer"] == "secondary: q"
+
+def test_wins_are_counted_across_threads():
+    backend = FakeBackend("only", 0)
+    search_router = router("single", backend)
+    threads = [threading.Thread(target=lambda: [search_router.search("q") for _ in range(200)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert search_router.stats()["wins"] == {"only": 1600}
@@ -0,0 +1,128 @@
+"""
+Smoke tests of the whole research pipeline against the mock OpenAI compatible and Exa servers
+of benchmarks/mock_servers.py, with the same temporary config as the benchmark suite.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from mock_servers import LatencyDistribution, MockServers, MockState
+from run_benchmarks import write_benchmark_config
+
+@pytest.fixture(scope="module")
+def mocked():
+    state = MockState(LatencyDistribution.parse(None), LatencyDistribution.parse(None), plan_width=3)
+    with tempfile.TemporaryDirectory() as work_dir, MockServers(state) as servers:
+        env = {
+            "CONFIG_PATH": write_benchmark_config(work_dir),
+            "OPENAI_BASE_URL": servers.openai_base_url,
+            "OPENAI_API_KEY": "mock",
+            "EXA_BASE_URL": servers.exa_base_url,
+            "EXA_API_KEY": "mock"
+        }
+        saved = {name: os.environ.get(name) for name in env}
+        # app.py reads the environment and config.json at import time
+        os.environ.update(env)
+        sys.modules.pop("app", None)
+        import app
+        try:
+            yield app, state, work_dir
+        finally:
+            sys.modules.pop("app", None)
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+def run(app, work_dir: str, **kwargs) -> str:
+    from checkpoint import RunCheckpoint
+    checkpoint = RunCheckpoint.create(os.path.join(work_dir, "runs"))
+    return app.run_research(checkpoint, initial_query="Electric vehicle market trends", verbose=False, **kwargs)
+
+def test_run_research_skipping_followups(mocked):
+    app, state, work_dir = mocked
+    searches = state.counts["search"]
+    report = run(app, work_dir, skip_followups=True)
+    with open(report, "r") as file:
+        content = file.read()
+    assert content.strip()
+    assert state.counts["search"] > searches
+    assert not os.path.exists(report + ".partial")
+
+def test_run_research_with_followup_answers(mocked):
+    app, state, work_dir = mocked
+    report = run(app, work_dir, followup_answers=["Europe, 2020 to 2024"])
+    with open(report, "r") as file:
+        assert file.read().strip()
+
+def test_run_research_streaming_report(mocked):
+    app, state, work_dir = mocked
+    chunks = []
+    app.config["settings"]["stream_report"] = True
+    try:
+        report = run(app, work_dir, skip_followups=True, on_report_chunk=chunks.append)
+    finally:
+        app.config["settings"]["stream_report"] = False
+    with open(report, "r") as file:
+        assert file.read() == "".join(chunks)
+
+def test_batch_jobs_with_the_same_id_do_not_share_a_checkpoint(mocked):
+    app, state, work_dir = mocked
+    import batch
+    runs_path = os.path.join(work_dir, "runs")
+    for output_dir in ("batch_a", "batch_b"):
+        os.makedirs(os.path.join(work_dir, output_dir))
+    first = batch.run_job({"id": "job_1", "query": "EV market in Europe", "skip_followups": True}, os.path.join(work_dir, "batch_a"), runs_path)
+    searches = state.counts["search"]
+    second = batch.run_job({"id": "job_1", "query": "EV market in China", "skip_followups": True}, os.path.join(work_dir, "batch_b"), runs_path)
+    assert first["status"] == second["status"] == "completed"
+    assert first["run_id"] != second["run_id"]
+    assert second["report"] == os.path.join(work_dir, "batch_b", "job_1.md")
+    assert state.counts["search"] > searches
+
+def test_streamed_report_is_traced_once_with_its_token_usage(mocked):
+    app, state, work_dir = mocked
+    from tracing import Tracer
+    tracer, app.tracer = app.tracer, Tracer()
+    app.config["settings"]["stream_report"] = True
+    try:
+        run(app, work_dir, skip_followups=True)
+        spans = [span for trace_spans in app.tracer._spans.values() for span in trace_spans if span.name == "stream_report"]
+    finally:
+        app.config["settings"]["stream_report"] = False
+        app.tracer = tracer
+    assert len(spans) == 1
+    assert spans[0].trace_id is not None
+    assert spans[0].attributes["completion_tokens"] > 0
+
+def test_kept_speculative_searches_are_adopted_into_the_run(mocked, monkeypatch):
+    app, state, work_dir = mocked
+    from checkpoint import RunCheckpoint
+    monkeypatch.setitem(app.config["settings"], "speculative_planning", True)
+    monkeypatch.setitem(app.config["settings"], "speculative_searches", True)
+    monkeypatch.setitem(app.config["settings"], "speculation_max_new_terms", 100)
+    monkeypatch.setattr("builtins.input", lambda prompt="": "Europe")
+    checkpoint = RunCheckpoint.create(os.path.join(work_dir, "runs"))
+    report = app.run_research(checkpoint, initial_query="Electric vehicle market trends", verbose=False)
+    recorded = [source["id"] for source in checkpoint.sources()]
+    assert recorded == [f"S{i}" for i in range(1, len(recorded) + 1)]
+    assert set(checkpoint.completed_steps()) == set(checkpoint.load_stage("research_plan")["plan"])
+    with open(report, "r") as file:
+        assert file.read().strip()
+
+def test_refresh_searches_skips_the_search_cache(mocked, monkeypatch):
+    app, state, work_dir = mocked
+    monkeypatch.setattr(app.search_cache, "enabled", True)
+    run(app, work_dir, skip_followups=True)
+    searches = state.counts["search"]
+    run(app, work_dir, skip_followups=True)
+    assert state.counts["search"] == searches
+    run(app, work_dir, skip_followups=True, refresh_searches=True)
+    assert state.counts["search"] > searches
@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_synthesis import estimate_tokens
+from source_store import SourceStore, normalize_url
+
+def test_format_sources_stays_within_the_budget():
+    sources = SourceStore()
+    ids = [sources.add({"url": f"https://example.com/{i}", "title": f"Source {i}", "text": "x" * 200}) for i in range(100)]
+    block = sources.format_sources(ids, 100)
+    assert estimate_tokens(block) <= 100
+    assert block.startswith("[S1] Source 0")
+
+def test_format_sources_lists_titles_once_texts_no_longer_fit():
+    sources = SourceStore()
+    ids = [sources.add({"url": f"https://example.com/{i}", "title": f"Source {i}", "text": "x" * 200}) for i in range(3)]
+    block = sources.format_sources(ids, 70)
+    assert "x" * 200 in block
+    assert "[S2] Source 1 (https://example.com/1)" in block
+
+def test_merge_interns_the_other_store_under_new_ids():
+    sources = SourceStore()
+    sources.add({"url": "https://example.com/a", "title": "A"})
+    speculative = SourceStore()
+    speculative.add({"url": "https://example.com/b", "title": "B", "text": "b"})
+    speculative.add({"url": "https://www.example.com/a/", "title": "A again"})
+    assert sources.merge(speculative) == {"S1": "S2", "S2": "S1"}
+    assert sources.get("S2")["text"] == "b"
+
+def test_normalize_url_drops_only_tracking_parameters():
+    assert normalize_url("https://example.com/a/?utm_source=x&ref=home&ref_src=tw&id=1") == "https://example.com/a?id=1"
+    assert normalize_url("https://example.com/a?reference=ISO-8601&refresh=1") == "https://example.com/a?reference=ISO-8601&refresh=1"
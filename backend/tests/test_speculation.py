@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from speculation import SpeculativePlanner
+
+def plan(context, cancelled):
+    return {"research_plan": {"plan": {"step 1": context}}}
+
+def test_confirming_answers_keep_the_speculation():
+    planner = SpeculativePlanner(plan)
+    planner.before_followup("EV market trends")
+    assert planner.after_answer("Should the research cover EV market trends?", "yes, both")
+    assert planner.result() == {"research_plan": {"plan": {"step 1": "EV market trends"}}}
+
+def test_a_one_word_answer_cancels_the_speculation():
+    planner = SpeculativePlanner(plan)
+    planner.before_followup("EV market trends")
+    assert not planner.after_answer("Which market?", "Europe")
+    assert planner.result() is None
+    assert planner.stats() == {"kept": 0, "cancelled": 1}
+
+def test_yes_to_a_narrowing_question_cancels_the_speculation():
+    planner = SpeculativePlanner(plan)
+    planner.before_followup("EV market trends")
+    assert not planner.after_answer("Should the research focus on Europe?", "yes")
+
+def test_a_negation_cancels_the_speculation():
+    planner = SpeculativePlanner(plan)
+    planner.before_followup("EV market trends")
+    assert not planner.after_answer("EV market trends?", "not those")
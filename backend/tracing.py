@@ -0,0 +1,172 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_current_trace: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_trace", default=None)
+
+# Attributes that are summed per stage in the summary table
+SUMMED_ATTRIBUTES = ("prompt_tokens", "completion_tokens", "request_bytes", "response_bytes")
+
+class Span:
+    """A timed pipeline stage with its attributes (provider, model, token counts, bytes, ...)."""
+
+    def __init__(self, name: str, trace_id: Optional[str], parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_seconds": round(self.duration, 6) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+class JsonlExporter:
+    """Appends finished spans to a JSONL file, path may contain {trace_id} to get one file per run."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        path = self.path.format(trace_id=span.trace_id or "untraced")
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+
+class OpenTelemetryExporter:
+    """Re-emits finished spans through the OpenTelemetry API (requires the opentelemetry-api package)."""
+
+    def __init__(self, service_name: str = "deeper-seeker"):
+        from opentelemetry import trace
+
+        self._tracer = trace.get_tracer(service_name)
+
+    def export(self, span: Span):
+        attributes = {key: value for key, value in span.attributes.items() if isinstance(value, (str, bool, int, float))}
+        attributes.update({"trace_id": span.trace_id or "", "span_id": span.span_id, "parent_id": span.parent_id or ""})
+        otel_span = self._tracer.start_span(span.name, start_time=int(span.start_time * 1e9), attributes=attributes)
+        if span.error:
+            otel_span.set_attribute("error", span.error)
+        otel_span.end(end_time=int((span.start_time + span.duration) * 1e9))
+
+class Tracer:
+    """Collects spans of the research pipeline and hands finished spans to the exporters."""
+
+    def __init__(self, exporters: Optional[List[Any]] = None, enabled: bool = True):
+        self.exporters = exporters or []
+        self.enabled = enabled
+        self._spans: Dict[Optional[str], List[Span]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, tracing_config: Dict[str, Any], base_dir: str) -> "Tracer":
+        exporters = []
+        jsonl_path = tracing_config.get("jsonl_path", "runs/{trace_id}/trace.jsonl")
+        if jsonl_path:
+            exporters.append(JsonlExporter(os.path.join(base_dir, jsonl_path)))
+        if tracing_config.get("opentelemetry", False):
+            exporters.append(OpenTelemetryExporter())
+        return cls(exporters, enabled=tracing_config.get("enabled", True))
+
+    @contextmanager
+    def trace(self, trace_id: str) -> Iterator[str]:
+        """Attribute every span started in this context (and the tasks / threads it spawns) to trace_id."""
+        token = _current_trace.set(trace_id)
+        try:
+            yield trace_id
+        finally:
+            _current_trace.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        if not self.enabled:
+            yield None
+            return
+        parent = _current_span.get()
+        span = Span(name, _current_trace.get(), parent.span_id if parent else None,
+                    {key: value for key, value in attributes.items() if value is not None})
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as error:
+            span.finish(error)
+            raise
+        else:
+            span.finish()
+        finally:
+            _current_span.reset(token)
+            self._record(span)
+
+    def _record(self, span: Span):
+        with self._lock:
+            self._spans.setdefault(span.trace_id, []).append(span)
+        for exporter in self.exporters:
+            exporter.export(span)
+
+    def spans(self, trace_id: Optional[str]) -> List[Span]:
+        with self._lock:
+            return list(self._spans.get(trace_id, []))
+
+    def discard(self, trace_id: Optional[str]):
+        """Drop the in-memory spans of a finished run, the exporters already have them."""
+        with self._lock:
+            self._spans.pop(trace_id, None)
+
+    def summary(self, trace_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Per stage totals for one run, slowest stage first."""
+        rows: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans(trace_id):
+            row = rows.setdefault(span.name, {"stage": span.name, "count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "errors": 0})
+            row["count"] += 1
+            row["total_seconds"] += span.duration or 0.0
+            row["max_seconds"] = max(row["max_seconds"], span.duration or 0.0)
+            row["errors"] += span.error is not None
+            for attribute in SUMMED_ATTRIBUTES:
+                if isinstance(span.attributes.get(attribute), (int, float)):
+                    row[attribute] = row.get(attribute, 0) + span.attributes[attribute]
+        return sorted(rows.values(), key=lambda row: row["total_seconds"], reverse=True)
+
+    def format_summary(self, trace_id: Optional[str]) -> str:
+        columns = ("stage", "count", "total_seconds", "max_seconds", "errors") + SUMMED_ATTRIBUTES
+        lines = [" | ".join(columns), " | ".join("---" for _ in columns)]
+        for row in self.summary(trace_id):
+            lines.append(" | ".join(
+                f"{row.get(column, 0):.3f}" if isinstance(row.get(column), float) else str(row.get(column, "-"))
+                for column in columns
+            ))
+        return "\n".join(lines)
+
+def annotate(**attributes):
+    """Add attributes to the innermost active span, e.g. token counts reported by a provider."""
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)